@@ -7,6 +7,7 @@ from schemas import (
     MessageOnlySchema,
     SelfEditSchema,
     UserGetSchema,
+    UserIDsSchema,
     UserRegisterSchema,
     UserSchema,
 )
@@ -82,6 +83,20 @@ class User(MethodView):
         return {"message": "User deleted."}
 
 
+@blp.route("/users")
+class UserList(MethodView):
+    @blp.arguments(UserIDsSchema, location="query")
+    @blp.response(
+        200,
+        description="Found users keyed by their IDs. Not found IDs are omitted.",
+        example={"1": {"id": 1, "username": "string", "email": "string"}},
+    )
+    def get(self, user_ids_data):
+        users = UserModel.query.filter(UserModel.id.in_(user_ids_data["ids"])).all()
+        user_schema = UserGetSchema()
+        return {str(user.id): user_schema.dump(user) for user in users}
+
+
 @blp.route("/<int:user_id>")
 class UserActions(MethodView):
     @blp.arguments(SelfEditSchema)
@@ -1,5 +1,6 @@
 from marshmallow import Schema, fields
 from marshmallow.validate import Length
+from webargs.fields import DelimitedList
 
 
 class UserSchema(Schema):
@@ -30,6 +31,10 @@ class UserGetSchema(Schema):
     lastname = fields.Str(dump_only=True)
 
 
+class UserIDsSchema(Schema):
+    ids = DelimitedList(fields.Int(), required=True, validate=Length(min=1, max=100))
+
+
 class MessageOnlySchema(Schema):
     message = fields.Str(required=True)
 
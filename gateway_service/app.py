@@ -6,7 +6,7 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_smorest import Api
 from jwt_settings import jwt_set_up
-from rabbit import POOL, init_queues
+from rabbit import PUBLISHER
 from resources import (
     AuthBlueprint,
     FolderBlueprint,
@@ -16,6 +16,7 @@ from resources import (
     ReportBlueprint,
     ShiftBlueprint,
     ShopBlueprint,
+    StatsBlueprint,
 )
 
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
@@ -58,8 +59,9 @@ def create_app():
     api.register_blueprint(ReceiptBlueprint)
     api.register_blueprint(ReportBlueprint)
     api.register_blueprint(NotificationBlueprint)
-    POOL.init(app)
-
-    init_queues()
+    # Stats are only served when a key for monitoring is configured
+    if os.environ.get("STATS_API_KEY"):
+        api.register_blueprint(StatsBlueprint)
+    PUBLISHER.init(app)
 
     return app
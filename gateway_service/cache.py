@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from blocklist import redis_client
+from redis import Redis
+from redis.exceptions import RedisError
+
+LOOKUP_CACHE_SIZE = int(os.environ.get("LOOKUP_CACHE_SIZE", "1024"))
+LOOKUP_CACHE_TTL = int(os.environ.get("LOOKUP_CACHE_TTL", "300"))
+LOOKUP_CACHE_USE_REDIS = os.environ.get("LOOKUP_CACHE_USE_REDIS", "False").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+class LookupCache:
+    """
+    In-process LRU cache with TTL for rarely changing upstream objects (users,
+    shops). Values are stored as JSON strings, so every hit returns a fresh
+    object which the caller is free to modify. Optionally the entries are also
+    kept in Redis, so that all gateway workers share them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = LOOKUP_CACHE_SIZE,
+        ttl: int = LOOKUP_CACHE_TTL,
+        redis_client: Redis = None,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key):
+        return f"lookup_cache:{self.name}:{key}"
+
+    def _get_local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def _get_redis(self, key):
+        if self.redis_client is None:
+            return None
+        try:
+            value = self.redis_client.get(self._redis_key(key))
+        except RedisError:
+            return None
+        return value.decode() if value is not None else None
+
+    def get(self, key):
+        key = str(key)
+        value = self._get_local(key)
+        if value is None:
+            value = self._get_redis(key)
+            if value is not None:
+                self._set_local(key, value)
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, obj):
+        key = str(key)
+        value = json.dumps(obj, default=str)
+        self._set_local(key, value)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self._redis_key(key), value, ex=self.ttl)
+            except RedisError:
+                pass
+
+    def invalidate(self, key):
+        key = str(key)
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.delete(self._redis_key(key))
+            except RedisError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "name": self.name,
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+USER_CACHE = LookupCache(
+    "user", redis_client=redis_client if LOOKUP_CACHE_USE_REDIS else None
+)
+SHOP_CACHE = LookupCache(
+    "shop", redis_client=redis_client if LOOKUP_CACHE_USE_REDIS else None
+)
@@ -1,105 +1,343 @@
+import atexit
+import functools
 import os
+import queue
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future
 
 import pika
-from flask import current_app
 
 RABBIT_HOST = os.environ.get("RABBIT_HOST")
 RABBIT_PORT = os.environ.get("RABBIT_PORT")
 RABBIT_USER = os.environ.get("RABBIT_USER")
 RABBIT_PASSWORD = os.environ.get("RABBIT_PASSWORD")
 
+RABBIT_OUTBOX_SIZE = int(os.environ.get("RABBIT_OUTBOX_SIZE", "1000"))
+RABBIT_RECONNECT_DELAY = float(os.environ.get("RABBIT_RECONNECT_DELAY", "1"))
+RABBIT_RECONNECT_MAX_DELAY = float(os.environ.get("RABBIT_RECONNECT_MAX_DELAY", "30"))
+# Messages queued within the window are published together in one flush
+RABBIT_BATCH_WINDOW = float(os.environ.get("RABBIT_BATCH_WINDOW", "0.01"))
+RABBIT_BATCH_SIZE = int(os.environ.get("RABBIT_BATCH_SIZE", "100"))
 
-class RabbitConnectionPool:
+QUEUES = ["receipt_queue", "report_queue"]
+
+
+class OutboxFullError(Exception):
+    pass
+
+
+class MessageNackedError(Exception):
+    pass
+
+
+class PublisherClosedError(Exception):
+    pass
+
+
+class OutgoingMessage:
+    def __init__(self, routing_key, body, properties):
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.enqueued_at = time.monotonic()
+        # Resolved by the I/O thread once the broker confirms the message
+        self.future = Future()
+
+
+class PublisherMetrics:
     def __init__(self):
-        pass
+        self.lock = threading.Lock()
+        self.published = 0
+        self.nacked = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.republished = 0
+        self.reconnects = 0
+        self.batches = 0
+        self.batch_size_max = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def message_confirmed(self, message: OutgoingMessage):
+        latency = time.monotonic() - message.enqueued_at
+        with self.lock:
+            self.published += 1
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def batch_flushed(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batch_size_max = max(self.batch_size_max, size)
+
+    def increment(self, counter, value=1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "published": self.published,
+                "nacked": self.nacked,
+                "rejected": self.rejected,
+                "dropped": self.dropped,
+                "republished": self.republished,
+                "reconnects": self.reconnects,
+                "batches": self.batches,
+                "batch_size_max": self.batch_size_max,
+                "publish_latency_avg": (
+                    self.latency_sum / self.published if self.published else 0.0
+                ),
+                "publish_latency_max": self.latency_max,
+            }
+
+
+class RabbitPublisher:
+    """
+    Publishes messages to RabbitMQ from a dedicated I/O thread.
+
+    Request handlers only put messages into a bounded in-memory outbox, which
+    never blocks. The I/O thread owns the connection and its channel, publishes
+    with publisher confirms, republishes messages that were not confirmed
+    before a connection loss and reconnects with exponential backoff.
+
+    Messages are not published one by one: the first message starts a batch
+    window, and everything queued until it ends goes out in a single flush.
+    Every message carries a Future, which is resolved when the broker acks it
+    or fails with MessageNackedError when the broker rejects it.
+    """
+
+    def __init__(self, outbox_size=RABBIT_OUTBOX_SIZE):
+        self.outbox = queue.Queue(maxsize=outbox_size)
+        self.metrics = PublisherMetrics()
+        self.logger = None
+        self.thread = None
+        self.connection = None
+        self.channel = None
+        self.ready = False
+        self.channel_opened = False
+        self.stopping = False
+        # Owned by the I/O thread only
+        self.retry_messages = deque()
+        self.unconfirmed = {}
+        self.delivery_tag = 0
+        self.flush_timer = None
 
     def init(self, app):
-        with app.app_context():
-            self.connection = None
-            self.desired_channels = 5
-            self.channels = []
-            self.free_channels = []
-            self._reset_channels()
-            current_app.logger.info("Connected to RabbitMQ and created queues.")
-
-    def _reset_channels(self):
-        if self.connection is None:
-            try:
-                credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASSWORD)
-                self.connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(
-                        host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials
-                    )
-                )
-            except pika.exceptions.AMQPConnectionError:
-                current_app.logger.warn(
-                    "Failed to connect to RabbitMQ service. Message wont be sent."
-                )
-                return
-            for i in range(self.desired_channels):
-                channel = self.connection.channel()
-                channel.queue_declare(queue="receipt_queue", durable=True)
-                channel.queue_declare(queue="report_queue", durable=True)
-                self.channels.append(channel)
-                self.free_channels.append(channel)
-            current_app.logger.info("Connection and channels reset.")
-
-    def publish_message(self, routing_key, body, properties):
-        if self.connection is None:
-            self._reset_channels()
-
-            attempts_count = 0
-            while self.connection is None:
-                time.sleep(3)
-                self._reset_channels()
-                attempts_count += 1
-                if attempts_count == 10:
-                    raise Exception("Can't connect to RabbitMQ")
-
-        while len(self.free_channels) == 0:
-            time.sleep(3)
+        self.logger = app.logger
+        self.thread = threading.Thread(
+            target=self._run, name="rabbit_publisher", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.close)
+
+    def publish_message(self, routing_key, body, properties) -> Future:
+        message = OutgoingMessage(routing_key, body, properties)
         try:
-            channel = self.free_channels.pop()
-            channel.basic_publish(
-                exchange="", routing_key=routing_key, body=body, properties=properties
+            self.outbox.put_nowait(message)
+        except queue.Full:
+            self.metrics.increment("rejected")
+            self.logger.warning(
+                f"RabbitMQ outbox is full, message to {routing_key} is dropped."
+            )
+            raise OutboxFullError("RabbitMQ outbox is full. Message wont be sent.")
+        self._call_in_io_thread(self._schedule_flush)
+        return message.future
+
+    def stats(self):
+        return {
+            **self.metrics.snapshot(),
+            "outbox_depth": self.outbox.qsize(),
+            "in_flight": len(self.unconfirmed),
+            "connected": self.ready,
+        }
+
+    def close(self, timeout=5):
+        self.stopping = True
+        self._call_in_io_thread(self._close_connection)
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                return
+
+        # The I/O thread is gone, nobody is going to publish what's left
+        messages = list(self.retry_messages) + list(self.unconfirmed.values())
+        while not self.outbox.empty():
+            messages.append(self.outbox.get_nowait())
+        dropped = 0
+        for message in messages:
+            if not message.future.done():
+                dropped += 1
+                message.future.set_exception(
+                    PublisherClosedError("Publisher closed before confirmation.")
+                )
+        if dropped:
+            self.metrics.increment("dropped", dropped)
+            self.logger.warning(
+                f"RabbitMQ publisher closed, {dropped} messages are dropped."
             )
-            current_app.logger.info("Message published")
-            self.free_channels.append(channel)
-        except pika.exceptions.StreamLostError:
-            current_app.logger.warn("Stream lost. Creating new connection.")
-            self.connection = None
-            self._reset_channels()
-
-            attempts_count = 0
-            while self.connection is None:
-                time.sleep(3)
-                self._reset_channels()
-                attempts_count += 1
-                if attempts_count == 10:
-                    raise Exception("Can't connect to RabbitMQ")
-            channel = self.free_channels.pop()
-            channel.basic_publish(
-                exchange="", routing_key=routing_key, body=body, properties=properties
+
+    def _call_in_io_thread(self, callback):
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            connection.ioloop.add_callback_threadsafe(callback)
+        except Exception:
+            # Connection is being torn down, messages wait for the next one
+            pass
+
+    # Everything below runs in the I/O thread
+
+    def _run(self):
+        delay = RABBIT_RECONNECT_DELAY
+        while not self.stopping:
+            self.channel_opened = False
+            credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASSWORD)
+            self.connection = pika.SelectConnection(
+                pika.ConnectionParameters(
+                    host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials
+                ),
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_open_error,
+                on_close_callback=self._on_connection_closed,
             )
-            current_app.logger.info("Message published")
-            self.free_channels.append(channel)
+            self.connection.ioloop.start()
 
+            if self.stopping:
+                break
+            if self.channel_opened:
+                delay = RABBIT_RECONNECT_DELAY
+            self.metrics.increment("reconnects")
+            self.logger.warning(f"Reconnecting to RabbitMQ in {delay} seconds.")
+            time.sleep(delay)
+            delay = min(delay * 2, RABBIT_RECONNECT_MAX_DELAY)
+        self.connection = None
 
-def init_queues():
-    try:
-        credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASSWORD)
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, error):
+        self.logger.warning(f"Failed to connect to RabbitMQ service: {error!r}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self.channel = None
+        self.ready = False
+        self.flush_timer = None
+        # Messages which weren't confirmed will be published once again
+        self.retry_messages.extend(
+            message for _, message in sorted(self.unconfirmed.items())
+        )
+        self.metrics.increment("republished", len(self.unconfirmed))
+        self.unconfirmed = {}
+        if not self.stopping:
+            self.logger.warning(f"RabbitMQ connection closed: {reason!r}")
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self.channel = channel
+        channel.add_on_close_callback(self._on_channel_closed)
+        self._declare_queues(QUEUES)
+
+    def _on_channel_closed(self, channel, reason):
+        self.logger.warning(f"RabbitMQ channel closed: {reason!r}")
+        if self.connection.is_open:
+            self.connection.close()
+
+    def _declare_queues(self, queues, _frame=None):
+        if not queues:
+            self.channel.confirm_delivery(
+                self._on_delivery_confirmation, callback=self._on_confirm_selected
             )
+            return
+        self.channel.queue_declare(
+            queue=queues[0],
+            durable=True,
+            callback=functools.partial(self._declare_queues, queues[1:]),
+        )
+
+    def _on_confirm_selected(self, _frame):
+        self.delivery_tag = 0
+        self.ready = True
+        self.channel_opened = True
+        self.logger.info("Connected to RabbitMQ and created queues.")
+        self._flush()
+
+    def _next_message(self):
+        if self.retry_messages:
+            return self.retry_messages.popleft()
+        try:
+            return self.outbox.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _schedule_flush(self):
+        if not self.ready or self.flush_timer is not None:
+            return
+        if RABBIT_BATCH_WINDOW <= 0:
+            self._flush()
+            return
+        self.flush_timer = self.connection.ioloop.call_later(
+            RABBIT_BATCH_WINDOW, self._flush
         )
-    except pika.exceptions.AMQPConnectionError:
-        return
-    channel = connection.channel()
-    channel.queue_declare(queue="receipt_queue", durable=True)
-    channel.queue_declare(queue="report_queue", durable=True)
-    connection.close()
+
+    def _flush(self):
+        self.flush_timer = None
+        published = 0
+        while published < RABBIT_BATCH_SIZE:
+            if not self.ready or self.channel is None or not self.channel.is_open:
+                return
+            message = self._next_message()
+            if message is None:
+                break
+            self.channel.basic_publish(
+                exchange="",
+                routing_key=message.routing_key,
+                body=message.body,
+                properties=message.properties,
+            )
+            self.delivery_tag += 1
+            self.unconfirmed[self.delivery_tag] = message
+            published += 1
+
+        if published:
+            self.metrics.batch_flushed(published)
+        if self.retry_messages or not self.outbox.empty():
+            # Let the I/O loop send this batch before the next one is published
+            self.flush_timer = self.connection.ioloop.call_later(0, self._flush)
+
+    def _on_delivery_confirmation(self, frame):
+        confirmation = frame.method
+        if confirmation.multiple:
+            tags = [tag for tag in self.unconfirmed if tag <= confirmation.delivery_tag]
+        else:
+            tags = [confirmation.delivery_tag]
+
+        is_ack = isinstance(confirmation, pika.spec.Basic.Ack)
+        for tag in tags:
+            message = self.unconfirmed.pop(tag, None)
+            if message is None:
+                continue
+            if is_ack:
+                self.metrics.message_confirmed(message)
+                message.future.set_result(True)
+            else:
+                self.metrics.increment("nacked")
+                self.logger.warning(
+                    f"RabbitMQ didn't accept message to {message.routing_key}."
+                )
+                message.future.set_exception(
+                    MessageNackedError(
+                        f"RabbitMQ didn't accept message to {message.routing_key}."
+                    )
+                )
+
+    def _close_connection(self):
+        if self.connection is not None and self.connection.is_open:
+            self.connection.close()
 
 
-POOL = RabbitConnectionPool()
+PUBLISHER = RabbitPublisher()
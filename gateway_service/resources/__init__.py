@@ -5,4 +5,5 @@ from resources.receipt import blp as ReceiptBlueprint  # noqa
 from resources.report import blp as ReportBlueprint  # noqa
 from resources.shift import blp as ShiftBlueprint  # noqa
 from resources.shop import blp as ShopBlueprint  # noqa
+from resources.stats import blp as StatsBlueprint  # noqa
 from resources.notification import blp as NotificationBlueprint  # noqa
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 
 from blocklist import BLOCKLIST
+from cache import USER_CACHE
 from flask.views import MethodView
 from flask_jwt_extended import (
     create_access_token,
@@ -10,7 +11,7 @@ from flask_jwt_extended import (
     jwt_required,
 )
 from flask_smorest import Blueprint, abort
-from resources.utils import send_request
+from resources.utils import proxy_request, send_request
 from schemas import (
     MessageOnlySchema,
     MessageWithIDSchema,
@@ -45,8 +46,7 @@ class UserRegister(MethodView):
         user_data["is_owner"] = False
         user_data["shop_id"] = jwt.get("shop_id")
 
-        result = send_request("POST", f"{AUTH_SERVICE_URL}/register", data=user_data)
-        return result["result_json"], result["status_code"]
+        return proxy_request("POST", f"{AUTH_SERVICE_URL}/register", data=user_data)
 
 
 @blp.route("/login")
@@ -129,5 +129,6 @@ class UserActions(MethodView):
     @blp.alt_response(401, description="Invalid credentials.")
     def put(self, user_data):
         user_id = get_jwt_identity()
-        result = send_request("PUT", f"{AUTH_SERVICE_URL}/{user_id}", data=user_data)
-        return result["result_json"], result["status_code"]
+        response = proxy_request("PUT", f"{AUTH_SERVICE_URL}/{user_id}", data=user_data)
+        USER_CACHE.invalidate(user_id)
+        return response
@@ -7,10 +7,12 @@ from resources.utils import (
     get_shop_id,
     get_shop_id_params,
     is_staff_member,
-    send_request,
+    proxy_request,
 )
 from schemas import (
+    CatalogFolderSchema,
     FolderEditSchema,
+    FolderListQuerySchema,
     FolderReturnSchema,
     MessageOnlySchema,
     MessageWithIDSchema,
@@ -31,20 +33,24 @@ class FolderCreate(MethodView):
     @blp.alt_response(409, description="There is an item like this in the shop.")
     def post(self, folder_data):
         folder_data["shop_id"] = get_shop_id()
-        result = send_request("POST", f"{ITEM_SERVICE_URL}/folder", data=folder_data)
-        return result["result_json"], result["status_code"]
+        return proxy_request("POST", f"{ITEM_SERVICE_URL}/folder", data=folder_data)
 
 
 @blp.route("/shop/<int:shop_id>/folder")
 class FolderList(MethodView):
     @jwt_required()
+    @blp.arguments(FolderListQuerySchema, location="query")
     @blp.response(
-        200, FolderReturnSchema(many=True), description="Folders returned successfully."
+        200,
+        CatalogFolderSchema(many=True),
+        description="Folders returned successfully.",
     )
-    def get(self, shop_id):
+    @blp.alt_response(304, description="Catalog of the shop hasn't changed.")
+    def get(self, page_params, shop_id):
         is_staff_member(shop_id)
-        result = send_request("GET", f"{ITEM_SERVICE_URL}/shop/{shop_id}/folder")
-        return result["result_json"], result["status_code"]
+        return proxy_request(
+            "GET", f"{ITEM_SERVICE_URL}/shop/{shop_id}/folder", params=page_params
+        )
 
 
 @blp.route("/folder/<int:folder_id>")
@@ -53,10 +59,9 @@ class Folder(MethodView):
     @blp.response(200, FolderReturnSchema, description="Folder returned successfully.")
     @blp.alt_response(404, description="Folder with this id wasn't found.")
     def get(self, folder_id):
-        result = send_request(
+        return proxy_request(
             "GET", f"{ITEM_SERVICE_URL}/folder/{folder_id}", params=get_shop_id_params()
         )
-        return result["result_json"], result["status_code"]
 
     @jwt_required()
     @blp.arguments(FolderEditSchema)
@@ -64,22 +69,20 @@ class Folder(MethodView):
     @blp.alt_response(404, description="Folder with this id wasn't found.")
     @blp.alt_response(409, description="There is an item with this name in the shop.")
     def put(self, folder_edit_data, folder_id):
-        result_put = send_request(
+        return proxy_request(
             "PUT",
             f"{ITEM_SERVICE_URL}/folder/{folder_id}",
             data=folder_edit_data,
             params=get_shop_id_params(),
         )
-        return result_put["result_json"], result_put["status_code"]
 
     @jwt_required()
     @blp.response(200, MessageOnlySchema, description="Folder deleted successfully.")
     @blp.alt_response(404, description="Folder with this id wasn't found.")
     @blp.alt_response(409, description="There are still items in the folder.")
     def delete(self, folder_id):
-        result_delete = send_request(
+        return proxy_request(
             "DELETE",
             f"{ITEM_SERVICE_URL}/folder/{folder_id}",
             params=get_shop_id_params(),
         )
-        return result_delete["result_json"], result_delete["status_code"]
@@ -6,16 +6,25 @@ from flask_smorest import Blueprint
 from resources.utils import (
     get_shop_id,
     get_shop_id_params,
+    get_streamed_body,
     is_staff_member,
-    send_request,
+    proxy_request,
 )
 from schemas import (
+    CatalogItemSchema,
+    ItemAutocompleteQuerySchema,
+    ItemBulkReportSchema,
     ItemCountEditSchema,
+    ItemCountSchema,
     ItemCreateSchema,
     ItemEditSchema,
+    ItemExportQuerySchema,
+    ItemLookupSchema,
+    ItemNameSchema,
     ItemReturnSchema,
     ItemSearchSchema,
     MessageOnlySchema,
+    PageQuerySchema,
 )
 
 blp = Blueprint("Item", "item", description="Operations on items")
@@ -32,20 +41,71 @@ class ItemCreate(MethodView):
     @blp.alt_response(409, description="There is an item like this in the shop.")
     def post(self, item_data):
         item_data["shop_id"] = get_shop_id()
-        result = send_request("POST", f"{ITEM_SERVICE_URL}/item", data=item_data)
-        return result["result_json"], result["status_code"]
+        return proxy_request("POST", f"{ITEM_SERVICE_URL}/item", data=item_data)
 
 
 @blp.route("/shop/<int:shop_id>/item")
 class ItemList(MethodView):
     @jwt_required()
+    @blp.arguments(PageQuerySchema, location="query")
     @blp.response(
-        200, ItemReturnSchema(many=True), description="Items returned successfully."
+        200, CatalogItemSchema(many=True), description="Items returned successfully."
     )
-    def get(self, shop_id):
+    @blp.alt_response(304, description="Catalog of the shop hasn't changed.")
+    def get(self, page_params, shop_id):
         is_staff_member(shop_id)
-        result = send_request("GET", f"{ITEM_SERVICE_URL}/shop/{shop_id}/item")
-        return result["result_json"], result["status_code"]
+        return proxy_request(
+            "GET", f"{ITEM_SERVICE_URL}/shop/{shop_id}/item", params=page_params
+        )
+
+
+@blp.route("/shop/<int:shop_id>/item/counts")
+class ItemCountList(MethodView):
+    @jwt_required()
+    @blp.arguments(PageQuerySchema, location="query")
+    @blp.response(
+        200, ItemCountSchema(many=True), description="Counts returned successfully."
+    )
+    def get(self, page_params, shop_id):
+        is_staff_member(shop_id)
+        return proxy_request(
+            "GET",
+            f"{ITEM_SERVICE_URL}/shop/{shop_id}/item/counts",
+            params=page_params,
+        )
+
+
+@blp.route("/shop/<int:shop_id>/item/bulk")
+class ItemBulkCreate(MethodView):
+    @jwt_required()
+    @blp.response(200, ItemBulkReportSchema, description="Items imported.")
+    @blp.alt_response(400, description="Body is not a JSON array, NDJSON or CSV.")
+    @blp.alt_response(411, description="Body has no Content-Length.")
+    def post(self, shop_id):
+        """
+        Creates many items at once from a JSON array, NDJSON or CSV body.
+        Invalid rows are skipped and reported with their errors.
+        """
+        is_staff_member(shop_id)
+        return proxy_request(
+            "POST",
+            f"{ITEM_SERVICE_URL}/shop/{shop_id}/item/bulk",
+            raw_data=get_streamed_body(),
+        )
+
+
+@blp.route("/shop/<int:shop_id>/item/export")
+class ItemExport(MethodView):
+    @jwt_required()
+    @blp.arguments(ItemExportQuerySchema, location="query")
+    @blp.response(200, description="Items streamed as NDJSON or CSV.")
+    def get(self, export_params, shop_id):
+        is_staff_member(shop_id)
+        return proxy_request(
+            "GET",
+            f"{ITEM_SERVICE_URL}/shop/{shop_id}/item/export",
+            params=export_params,
+        )
 
 
 @blp.route("/item/<int:item_id>")
@@ -54,10 +114,9 @@ class Item(MethodView):
     @blp.response(200, ItemReturnSchema, description="Item returned successfully.")
     @blp.alt_response(404, description="Item wasn't found.")
     def get(self, item_id):
-        result = send_request(
+        return proxy_request(
             "GET", f"{ITEM_SERVICE_URL}/item/{item_id}", params=get_shop_id_params()
         )
-        return result["result_json"], result["status_code"]
 
     @jwt_required()
     @blp.arguments(ItemEditSchema)
@@ -68,22 +127,20 @@ class Item(MethodView):
         description="One of new item's name, article or barcode is already in the DB.",
     )
     def put(self, item_edit_data, item_id):
-        result_put = send_request(
+        return proxy_request(
             "PUT",
             f"{ITEM_SERVICE_URL}/item/{item_id}",
             data=item_edit_data,
             params=get_shop_id_params(),
         )
-        return result_put["result_json"], result_put["status_code"]
 
     @jwt_required()
     @blp.response(200, MessageOnlySchema, description="Item deleted successfully.")
     @blp.alt_response(404, description="Item wasn't found")
     def delete(self, item_id):
-        result_delete = send_request(
+        return proxy_request(
             "DELETE", f"{ITEM_SERVICE_URL}/item/{item_id}", params=get_shop_id_params()
         )
-        return result_delete["result_json"], result_delete["status_code"]
 
 
 @blp.route("/item/update_counts")
@@ -94,13 +151,41 @@ class ItemCounts(MethodView):
     @blp.alt_response(404, description="One of the items wasn't found.")
     def put(self, items_count_edit_data):
         get_jwt().get("shop_id")
-        result = send_request(
+        return proxy_request(
             "PUT",
             f"{ITEM_SERVICE_URL}/item/update_counts",
             data=items_count_edit_data,
             params=get_shop_id_params(),
         )
-        return result["result_json"], result["status_code"]
+
+
+@blp.route("/shop/<int:shop_id>/item/lookup")
+class ItemLookup(MethodView):
+    @jwt_required()
+    @blp.arguments(ItemLookupSchema, location="query")
+    @blp.response(200, ItemReturnSchema, description="Item returned successfully.")
+    @blp.alt_response(404, description="Item wasn't found.")
+    def get(self, lookup_params, shop_id):
+        is_staff_member(shop_id)
+        return proxy_request(
+            "GET",
+            f"{ITEM_SERVICE_URL}/shop/{shop_id}/item/lookup",
+            params=lookup_params,
+        )
+
+
+@blp.route("/shop/<int:shop_id>/item/autocomplete")
+class ItemAutocomplete(MethodView):
+    @jwt_required()
+    @blp.arguments(ItemAutocompleteQuerySchema, location="query")
+    @blp.response(200, ItemNameSchema(many=True), description="Names returned.")
+    def get(self, autocomplete_params, shop_id):
+        is_staff_member(shop_id)
+        return proxy_request(
+            "GET",
+            f"{ITEM_SERVICE_URL}/shop/{shop_id}/item/autocomplete",
+            params=autocomplete_params,
+        )
 
 
 @blp.route("/shop/<int:shop_id>/item/search")
@@ -110,9 +195,8 @@ class ItemSearch(MethodView):
     @blp.response(200, ItemReturnSchema(many=True), description="Search successful.")
     def get(self, item_search_params, shop_id):
         is_staff_member(shop_id)
-        result = send_request(
+        return proxy_request(
             "GET",
             f"{ITEM_SERVICE_URL}/shop/{shop_id}/item/search",
             params=item_search_params,
         )
-        return result["result_json"], result["status_code"]
@@ -6,7 +6,7 @@ from flask import current_app
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required
 from flask_smorest import Blueprint, abort
-from rabbit import POOL
+from rabbit import PUBLISHER
 from resources.utils import is_staff_member, send_request
 from schemas import MessageOnlySchema, ReceiverContactsSchema
 
@@ -36,7 +36,7 @@ class ReceiptSend(MethodView):
         receipt_object["receiver_email"] = receiver_contacts["email"]
 
         try:
-            POOL.publish_message(
+            PUBLISHER.publish_message(
                 "receipt_queue",
                 json.dumps(receipt_object),
                 pika.BasicProperties(
@@ -71,7 +71,7 @@ class ReceiptSend(MethodView):
 #         report_object["receiver_email"] = receiver_contacts["email"]
 
 #         try:
-#             POOL.publish_message(
+#             PUBLISHER.publish_message(
 #                 "report_queue",
 #                 json.dumps(report_object),
 #                 pika.BasicProperties(
@@ -3,9 +3,17 @@ import os
 from flask.views import MethodView
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask_smorest import Blueprint
-from resources.utils import get_shop_id_params, is_staff_member, send_request
+from resources.utils import (
+    get_shop,
+    get_shop_id_params,
+    get_users,
+    is_staff_member,
+    proxy_request,
+    send_request,
+)
 from schemas import (
     MessageWithIDandFNSchema,
+    ReceiptExportQuerySchema,
     ReceiptLoadSchema,
     ReceiptQuerySchema,
     ReceiptReturnSchema,
@@ -15,8 +23,6 @@ blp = Blueprint("Receipt", "receipt", description="Operations on receipts")
 
 REPORT_SERVICE_URL = os.environ.get("REPORT_SERVICE_URL")
 ITEM_SERVICE_URL = os.environ.get("ITEM_SERVICE_URL")
-AUTH_SERVICE_URL = os.environ.get("AUTH_SERVICE_URL")
-SHOP_SERVICE_URL = os.environ.get("SHOP_SERVICE_URL")
 
 
 @blp.route("/shop/<int:shop_id>/receipt")
@@ -35,19 +41,14 @@ class ReceiptList(MethodView):
         is_staff_member(shop_id)
         user_id = get_jwt_identity()
 
-        seller_result = send_request("GET", f"{AUTH_SERVICE_URL}/user/{user_id}")
-        if seller_result["status_code"] != 200:
-            return seller_result["result_json"], seller_result["status_code"]
-
-        shop_result = send_request("GET", f"{SHOP_SERVICE_URL}/shop/{shop_id}")
+        shop_result = get_shop(shop_id)
         if shop_result["status_code"] != 200:
             return shop_result["result_json"], shop_result["status_code"]
 
-        owner_result = send_request(
-            "GET", f"{AUTH_SERVICE_URL}/user/{shop_result['result_obj']['owner_id']}"
-        )
-        if seller_result["status_code"] != 200:
-            return seller_result["result_json"], seller_result["status_code"]
+        owner_id = shop_result["result_obj"]["owner_id"]
+        users_result = get_users(user_id, owner_id)
+        if users_result["status_code"] != 200:
+            return users_result["result_json"], users_result["status_code"]
 
         update_counts_data = [
             {"id": item["id"], "count_delta": -item["count"]}
@@ -68,11 +69,11 @@ class ReceiptList(MethodView):
                     result_update_counts["status_code"],
                 )
 
-        receipt_data["seller"] = seller_result["result_obj"]
+        receipt_data["seller"] = users_result["result_obj"][str(user_id)]
 
         shop_obj = shop_result["result_obj"]
         shop_obj.pop("owner_id")
-        shop_obj["owner"] = owner_result["result_obj"]
+        shop_obj["owner"] = users_result["result_obj"][str(owner_id)]
 
         receipt_data["shop"] = shop_obj
 
@@ -101,13 +102,29 @@ class ReceiptList(MethodView):
     @jwt_required()
     @blp.arguments(ReceiptQuerySchema, location="query")
     @blp.response(200, ReceiptReturnSchema(many=True))
+    @blp.alt_response(404, description="Receipt to continue after wasn't found.")
     def get(self, query_data, shop_id):
         is_staff_member(shop_id)
 
-        result = send_request(
+        if "projection" in query_data:
+            query_data["fields"] = ",".join(query_data.pop("projection"))
+
+        return proxy_request(
             "GET",
             f"{REPORT_SERVICE_URL}/shop/{shop_id}/receipt",
             params=query_data,
         )
 
-        return result["result_json"], result["status_code"]
+
+@blp.route("/shop/<int:shop_id>/receipt/export")
+class ReceiptExport(MethodView):
+    @jwt_required()
+    @blp.arguments(ReceiptExportQuerySchema, location="query")
+    @blp.response(200, description="Receipts streamed as NDJSON or CSV.")
+    def get(self, export_params, shop_id):
+        is_staff_member(shop_id)
+        return proxy_request(
+            "GET",
+            f"{REPORT_SERVICE_URL}/shop/{shop_id}/receipt/export",
+            params=export_params,
+        )
@@ -6,15 +6,22 @@ from flask import current_app, jsonify
 from flask.views import MethodView
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask_smorest import Blueprint
-from resources.utils import get_shop_id, get_shop_id_params, send_request
+from resources.utils import (
+    get_shop,
+    get_shop_id,
+    get_shop_id_params,
+    get_user,
+    proxy_request,
+    run_concurrently,
+    send_request,
+)
 from schemas import XReport, ZReport, ZReportWWarning
-from rabbit import POOL
+from rabbit import PUBLISHER
+from werkzeug.exceptions import HTTPException
 
 blp = Blueprint("Report", "report", description="Operations on reports")
 
 REPORT_SERVICE_URL = os.environ.get("REPORT_SERVICE_URL")
-SHOP_SERVICE_URL = os.environ.get("SHOP_SERVICE_URL")
-AUTH_SERVICE_URL = os.environ.get("AUTH_SERVICE_URL")
 
 
 @blp.route("/report/x")
@@ -29,20 +36,18 @@ class XReports(MethodView):
     def post(self):
         shop_id = get_shop_id()
         user_id = get_jwt_identity()
-        result = send_request(
+        return proxy_request(
             "POST",
             f"{REPORT_SERVICE_URL}/report/x",
             params={"user_id": user_id, "shop_id": shop_id},
         )
-        return result["result_json"], result["status_code"]
 
     @jwt_required()
     @blp.response(200, XReport(many=True), description="Return list of x reports.")
     def get(self):
-        result = send_request(
+        return proxy_request(
             "GET", f"{REPORT_SERVICE_URL}/report/x", params=get_shop_id_params()
         )
-        return result["result_json"], result["status_code"]
 
 
 @blp.route("/report/z")
@@ -57,25 +62,33 @@ class ZReports(MethodView):
     def post(self):
         shop_id = get_shop_id()
         user_id = get_jwt_identity()
-        result = send_request(
-            "POST",
-            f"{REPORT_SERVICE_URL}/report/z",
-            params={"user_id": user_id, "shop_id": shop_id},
-        )
-
-        if result["status_code"] == 201:
-            result_shop = send_request("GET", f"{SHOP_SERVICE_URL}/shop/{shop_id}")
 
-            if result_shop["status_code"] != 200:
-                result_warning = result["result_obj"]
-                result_warning["warning"] = "Can't send email to the owner."
-                return jsonify(result_warning), result["status_code"]
-
-            owner_id = result_shop["result_obj"]["owner_id"]
+        def create_report():
+            return send_request(
+                "POST",
+                f"{REPORT_SERVICE_URL}/report/z",
+                params={"user_id": user_id, "shop_id": shop_id},
+            )
+
+        def get_owner():
+            # The owner's email doesn't depend on the report, so it is
+            # looked up while the report is being created. When the report
+            # fails (no opened shift, another seller) the lookup is wasted;
+            # this is accepted, as the shop and the user usually come from
+            # SHOP_CACHE and USER_CACHE and a Z report is made once a shift.
+            try:
+                result_shop = get_shop(shop_id)
+                if result_shop["status_code"] != 200:
+                    return None
+                return get_user(result_shop["result_obj"]["owner_id"])
+            except HTTPException:
+                # Failed lookup must not fail the already created report
+                return None
 
-            result_owner = send_request("GET", f"{AUTH_SERVICE_URL}/user/{owner_id}")
+        result, result_owner = run_concurrently(create_report, get_owner)
 
-            if result_owner["status_code"] != 200:
+        if result["status_code"] == 201:
+            if result_owner is None or result_owner["status_code"] != 200:
                 result_warning = result["result_obj"]
                 result_warning["warning"] = "Can't send email to the owner."
                 return jsonify(result_warning), result["status_code"]
@@ -86,7 +99,7 @@ class ZReports(MethodView):
             report_object["receiver_email"] = owner_email
 
             try:
-                POOL.publish_message(
+                PUBLISHER.publish_message(
                     "report_queue",
                     json.dumps(report_object),
                     pika.BasicProperties(
@@ -104,7 +117,6 @@ class ZReports(MethodView):
     @jwt_required()
     @blp.response(200, ZReport(many=True), description="Return list of z reports.")
     def get(self):
-        result = send_request(
+        return proxy_request(
             "GET", f"{REPORT_SERVICE_URL}/report/z", params=get_shop_id_params()
         )
-        return result["result_json"], result["status_code"]
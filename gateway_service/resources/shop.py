@@ -1,9 +1,16 @@
 import os
 
+from cache import SHOP_CACHE
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required
 from flask_smorest import Blueprint
-from resources.utils import is_shop_owner, is_staff_member, send_request
+from resources.utils import (
+    get_shop,
+    is_shop_owner,
+    is_staff_member,
+    proxy_request,
+    send_request,
+)
 from schemas import MessageOnlySchema, ShopEditSchema, ShopRegisterSchema, ShopSchema
 
 blp = Blueprint("Shops", "shops", description="Operations on shops")
@@ -91,7 +98,7 @@ class User(MethodView):
     @blp.alt_response(404, description="Shop wasn't found")
     def get(self, shop_id):
         is_staff_member(shop_id)
-        result = send_request("GET", f"{SHOP_SERVICE_URL}/shop/{shop_id}")
+        result = get_shop(shop_id)
         return result["result_json"], result["status_code"]
 
     @jwt_required(fresh=True)
@@ -106,10 +113,11 @@ class User(MethodView):
     )
     def put(self, shop_edit_details, shop_id):
         is_shop_owner(shop_id)
-        result = send_request(
+        response = proxy_request(
             "PUT", f"{SHOP_SERVICE_URL}/shop/{shop_id}", data=shop_edit_details
         )
-        return result["result_json"], result["status_code"]
+        SHOP_CACHE.invalidate(shop_id)
+        return response
 
     @jwt_required(fresh=True)
     @blp.response(200, MessageOnlySchema)
@@ -117,8 +125,9 @@ class User(MethodView):
     @blp.alt_response(404, description="Shop wasn't found.")
     def delete(self, shop_id):
         is_shop_owner(shop_id)
-        result = send_request("DELETE", f"{SHOP_SERVICE_URL}/shop/{shop_id}")
-        return result["result_json"], result["status_code"]
+        response = proxy_request("DELETE", f"{SHOP_SERVICE_URL}/shop/{shop_id}")
+        SHOP_CACHE.invalidate(shop_id)
+        return response
 
 
 # @blp.route("/shop/<int:shop_id>/cash_edit")
@@ -0,0 +1,36 @@
+import hmac
+import os
+
+from cache import SHOP_CACHE, USER_CACHE
+from flask import request
+from flask.views import MethodView
+from flask_smorest import Blueprint, abort
+from rabbit import PUBLISHER
+
+blp = Blueprint("Stats", "stats", description="Statistics of the gateway")
+
+
+def check_stats_key():
+    """Stats are for monitoring only, it has to send STATS_API_KEY."""
+    stats_api_key = os.environ.get("STATS_API_KEY", "")
+    key = request.headers.get("X-Stats-Key", "")
+    if not stats_api_key or not hmac.compare_digest(
+        key.encode(), stats_api_key.encode()
+    ):
+        abort(401, message="Valid X-Stats-Key header is required.")
+
+
+@blp.route("/cache_stats")
+class CacheStats(MethodView):
+    @blp.alt_response(401, description="X-Stats-Key header is missing or wrong.")
+    def get(self):
+        check_stats_key()
+        return {"caches": [USER_CACHE.stats(), SHOP_CACHE.stats()]}, 200
+
+
+@blp.route("/rabbit_stats")
+class RabbitStats(MethodView):
+    @blp.alt_response(401, description="X-Stats-Key header is missing or wrong.")
+    def get(self):
+        check_stats_key()
+        return {"publisher": PUBLISHER.stats()}, 200
@@ -1,10 +1,41 @@
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-from flask import jsonify
+from cache import SHOP_CACHE, USER_CACHE, LookupCache
+from flask import (
+    Response,
+    copy_current_request_context,
+    has_request_context,
+    jsonify,
+)
 from flask import request as flask_request
 from flask_jwt_extended import get_jwt
 from flask_smorest import abort
+from upstream import UPSTREAMS
+
+AUTH_SERVICE_URL = os.environ.get("AUTH_SERVICE_URL")
+SHOP_SERVICE_URL = os.environ.get("SHOP_SERVICE_URL")
+
+FAN_OUT_WORKERS = int(os.environ.get("FAN_OUT_WORKERS", "16"))
+PROXY_CHUNK_SIZE = int(os.environ.get("PROXY_CHUNK_SIZE", str(64 * 1024)))
+
+# Upstream response headers kept by proxy_request
+PROXY_RESPONSE_HEADERS = [
+    "Content-Type",
+    "Content-Length",
+    "Content-Encoding",
+    "Content-Disposition",
+    "Cache-Control",
+    "ETag",
+    "Last-Modified",
+    "X-Next-After-Id",
+]
+
+fan_out_executor = ThreadPoolExecutor(
+    max_workers=FAN_OUT_WORKERS, thread_name_prefix="fan_out"
+)
 
 
 def is_staff_member(shop_id: int):
@@ -28,26 +59,78 @@ def get_shop_id_params():
     return {"shop_id": get_shop_id()}
 
 
-def send_request(method, url, headers=None, data=None, params=None):
+class StreamedBody:
+    """
+    Incoming request body which is read chunk by chunk while it's sent upstream,
+    instead of being buffered whole. Knowing its length, requests sends it with
+    the Content-Length of the incoming request rather than chunked.
+    """
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        while True:
+            chunk = self.stream.read(PROXY_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+
+def get_streamed_body():
+    """Body of the current request to be passed as raw_data of proxy_request."""
+    if flask_request.content_length is None:
+        # Werkzeug only reads a chunked body when the server has terminated
+        # the input, otherwise the stream is empty
+        if not flask_request.environ.get("wsgi.input_terminated"):
+            abort(411, message="Content-Length header is required.")
+        # Chunked upload, it's forwarded chunked as well
+        return flask_request.stream
+    return StreamedBody(flask_request.stream, flask_request.content_length)
+
+
+def _send_upstream(
+    method, url, headers=None, data=None, params=None, stream=False, raw_data=None
+):
     if not headers:
         try:
             headers = flask_request.headers
         except Exception:
             headers = {}
 
-    request_data = json.dumps(data, default=str) if data else None
-
-    if method == "GET":
-        response = requests.get(url, headers=headers, params=params)
-    elif method == "POST":
-        response = requests.post(url, headers=headers, data=request_data, params=params)
-    elif method == "PUT":
-        response = requests.put(url, headers=headers, data=request_data, params=params)
-    elif method == "DELETE":
-        response = requests.delete(url, headers=headers, params=params)
+    if raw_data is not None:
+        request_data = raw_data
     else:
+        request_data = json.dumps(data, default=str) if data else None
+
+    if method not in ("GET", "POST", "PUT", "DELETE"):
         raise ValueError(f"Invalid method: {method}")
 
+    try:
+        return UPSTREAMS.request(
+            method,
+            url,
+            headers=headers,
+            data=request_data if method in ("POST", "PUT") else None,
+            params=params,
+            stream=stream,
+        )
+    except requests.exceptions.Timeout:
+        abort(504, message="Upstream service didn't respond in time.")
+    except requests.exceptions.ConnectionError:
+        abort(502, message="Upstream service is unavailable.")
+
+
+def send_request(method, url, headers=None, data=None, params=None):
+    response = _send_upstream(method, url, headers, data, params)
+
     result_obj = json.loads(response.text)
 
     return {
@@ -56,3 +139,121 @@ def send_request(method, url, headers=None, data=None, params=None):
         "result_obj": result_obj,
         "result_json": jsonify(result_obj),
     }
+
+
+def proxy_request(method, url, headers=None, data=None, params=None, raw_data=None):
+    """
+    Pass-through variant of send_request for handlers which don't need to look
+    at the upstream payload. Body bytes and status are forwarded as they are,
+    chunk by chunk, without being decoded and re-encoded. raw_data is sent as
+    the request body instead of JSON encoded data, e.g. an uploaded CSV
+    streamed with get_streamed_body().
+    """
+    response = _send_upstream(
+        method, url, headers, data, params, stream=True, raw_data=raw_data
+    )
+
+    def generate():
+        try:
+            yield from response.raw.stream(PROXY_CHUNK_SIZE, decode_content=False)
+        finally:
+            # Fully read responses are already back in the pool by now,
+            # interrupted ones get their connection closed.
+            response.close()
+
+    return Response(
+        generate(),
+        status=response.status_code,
+        headers={
+            header: response.headers[header]
+            for header in PROXY_RESPONSE_HEADERS
+            if header in response.headers
+        },
+    )
+
+
+def make_result(result_obj, status_code=200):
+    return {
+        "plain_response": None,
+        "status_code": status_code,
+        "result_obj": result_obj,
+        "result_json": jsonify(result_obj),
+    }
+
+
+def send_cached_request(cache: LookupCache, key, url):
+    """
+    Read-through GET of a rarely changing object. On a cache hit the result has
+    the same shape as the one of send_request, but no upstream call is made.
+    """
+    result_obj = cache.get(key)
+    if result_obj is not None:
+        return make_result(result_obj)
+
+    result = send_request("GET", url)
+    if result["status_code"] == 200:
+        cache.set(key, result["result_obj"])
+    return result
+
+
+def get_users(*user_ids):
+    """
+    Looks up several users at once. Cached users are taken from the cache and
+    all the others are fetched from the auth service in a single request.
+    result_obj of the result is a dict of users keyed by their IDs as strings.
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    users = {}
+    for user_id in user_ids:
+        user = USER_CACHE.get(user_id)
+        if user is not None:
+            users[user_id] = user
+
+    missing_ids = [user_id for user_id in user_ids if user_id not in users]
+    if missing_ids:
+        result = send_request(
+            "GET",
+            f"{AUTH_SERVICE_URL}/users",
+            params={"ids": ",".join(dict.fromkeys(missing_ids))},
+        )
+        if result["status_code"] != 200:
+            return result
+        for user_id, user in result["result_obj"].items():
+            USER_CACHE.set(user_id, user)
+            users[user_id] = user
+
+    for user_id in user_ids:
+        if user_id not in users:
+            return make_result({"message": f"User {user_id} wasn't found."}, 404)
+
+    return make_result(users)
+
+
+def get_user(user_id):
+    result = get_users(user_id)
+    if result["status_code"] != 200:
+        return result
+    return make_result(result["result_obj"][str(user_id)])
+
+
+def get_shop(shop_id):
+    return send_cached_request(
+        SHOP_CACHE, shop_id, f"{SHOP_SERVICE_URL}/shop/{shop_id}"
+    )
+
+
+def run_concurrently(*calls):
+    """
+    Runs independent upstream calls (zero-argument callables) in parallel and
+    returns their results in the same order. Each call gets its own copy of the
+    current request context, so send_request can be used inside it as usual.
+    Exceptions, e.g. from abort, are re-raised in the calling thread.
+    """
+    if len(calls) == 1:
+        return [calls[0]()]
+
+    if has_request_context():
+        calls = [copy_current_request_context(call) for call in calls]
+
+    futures = [fan_out_executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
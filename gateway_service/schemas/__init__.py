@@ -5,15 +5,26 @@ from schemas.auth import UserSchema  # noqa
 from schemas.general import MessageOnlySchema  # noqa
 from schemas.general import MessageWithIDandFNSchema  # noqa
 from schemas.general import MessageWithIDSchema  # noqa
+from schemas.item import CatalogFolderSchema  # noqa
+from schemas.item import CatalogItemSchema  # noqa
 from schemas.item import FolderEditSchema  # noqa
+from schemas.item import FolderListQuerySchema  # noqa
 from schemas.item import FolderReturnSchema  # noqa
+from schemas.item import ItemAutocompleteQuerySchema  # noqa
+from schemas.item import ItemBulkReportSchema  # noqa
 from schemas.item import ItemCountEditSchema  # noqa
+from schemas.item import ItemCountSchema  # noqa
 from schemas.item import ItemCreateSchema  # noqa
 from schemas.item import ItemEditSchema  # noqa
+from schemas.item import ItemExportQuerySchema  # noqa
+from schemas.item import ItemLookupSchema  # noqa
+from schemas.item import ItemNameSchema  # noqa
 from schemas.item import ItemReturnSchema  # noqa
 from schemas.item import ItemSearchSchema  # noqa
+from schemas.item import PageQuerySchema  # noqa
 from schemas.item import PlainFolderSchema  # noqa
 from schemas.item import PlainItemSchema  # noqa
+from schemas.receipt import ReceiptExportQuerySchema  # noqa
 from schemas.receipt import ReceiptLoadSchema  # noqa
 from schemas.receipt import ReceiptQuerySchema  # noqa
 from schemas.receipt import ReceiptReturnSchema  # noqa
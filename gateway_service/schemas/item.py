@@ -1,6 +1,8 @@
 from marshmallow import Schema, fields
 from marshmallow.validate import Length, OneOf, Range
 
+MAX_PAGE_SIZE = 500
+
 
 class PlainItemSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -26,6 +28,30 @@ class PlainItemSchema(Schema):
     )
 
 
+class ItemBulkErrorSchema(Schema):
+    row = fields.Int(required=True)
+    errors = fields.Dict(keys=fields.Str(), required=True)
+
+
+class ItemBulkReportSchema(Schema):
+    created = fields.Int(required=True)
+    failed = fields.Int(required=True)
+    errors = fields.List(fields.Nested(ItemBulkErrorSchema()), required=True)
+
+
+class PageQuerySchema(Schema):
+    after_id = fields.Int(validate=Range(min=0))
+    limit = fields.Int(validate=Range(min=1, max=MAX_PAGE_SIZE))
+
+
+class FolderListQuerySchema(PageQuerySchema):
+    with_items = fields.Bool(load_default=True)
+
+
+class ItemExportQuerySchema(Schema):
+    format = fields.Str(load_default="ndjson", validate=OneOf(["ndjson", "csv"]))
+
+
 class PlainFolderSchema(Schema):
     id = fields.Int(dump_only=True)
     folder_name = fields.Str(required=True, validate=Length(max=80))
@@ -83,6 +109,36 @@ class ItemSearchSchema(Schema):
     folder_id = fields.Int()
 
 
+class ItemLookupSchema(Schema):
+    article = fields.Int(
+        validate=Range(
+            min=1,
+            max=10**5 - 1,
+            error="Article should be between 1 and 99999 inclusive.",
+        )
+    )
+    bar_code = fields.Int(
+        validate=Range(
+            min=10**12, max=10**13 - 1, error="Bar code should be 13-digits number."
+        )
+    )
+
+
+class ItemAutocompleteQuerySchema(Schema):
+    prefix = fields.Str(required=True, validate=Length(min=1, max=512))
+    limit = fields.Int(load_default=10, validate=Range(min=1, max=50))
+
+
+class ItemNameSchema(Schema):
+    id = fields.Int(dump_only=True)
+    item_name = fields.Str(dump_only=True)
+
+
+class ItemCountSchema(Schema):
+    id = fields.Int(dump_only=True)
+    count_existing = fields.Float(dump_only=True)
+
+
 class ItemCountEditSchema(Schema):
     id = fields.Int(required=True)
     count_delta = fields.Float(required=True)
@@ -93,6 +149,22 @@ class FolderReturnSchema(PlainFolderSchema):
     items = fields.List(fields.Nested(PlainItemSchema()), dump_only=True)
 
 
+# Items and folders of the lists cached with the catalog version. Counts aren't
+# versioned, so they're left out and listed by /item/counts instead.
+class PlainCatalogItemSchema(PlainItemSchema):
+    class Meta:
+        exclude = ("count_existing",)
+
+
+class CatalogItemSchema(ItemReturnSchema):
+    class Meta:
+        exclude = ("count_existing",)
+
+
+class CatalogFolderSchema(FolderReturnSchema):
+    items = fields.List(fields.Nested(PlainCatalogItemSchema()), dump_only=True)
+
+
 class FolderEditSchema(Schema):
     new_folder_name = fields.Str(validate=Length(max=80))
 
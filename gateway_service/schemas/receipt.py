@@ -1,8 +1,11 @@
 from marshmallow import Schema, fields
-from marshmallow.validate import Length, OneOf
-from schemas.item import ItemSchema
+from marshmallow.validate import Length, OneOf, Range, Regexp
+from schemas.item import MAX_PAGE_SIZE, ItemSchema
 from schemas.auth import SellerSchema
 from schemas.shop import ShopInfoSchema
+from webargs.fields import DelimitedList
+
+RECEIPT_FIELDS = ["items", "seller", "shop", "sum", "datetime", "sell_type", "fn"]
 
 
 class ReceiptLoadSchema(Schema):
@@ -19,7 +22,7 @@ class ReceiptReturnSchema(ReceiptLoadSchema):
     shop = fields.Nested(ShopInfoSchema(), dump_only=True)
 
 
-class ReceiptQuerySchema(Schema):
+class ReceiptFilterSchema(Schema):
     id = fields.Str()
     datetime_start = fields.DateTime()
     datetime_end = fields.DateTime()
@@ -29,3 +32,18 @@ class ReceiptQuerySchema(Schema):
     seller_id = fields.Int()
     sell_type = fields.Str(validate=OneOf(["CARD", "CASH"]))
     item_name_part = fields.Str(validate=Length(min=1, max=512))
+
+
+class ReceiptQuerySchema(ReceiptFilterSchema):
+    after_id = fields.Str(validate=Regexp("^[0-9a-f]{24}$"))
+    limit = fields.Int(validate=Range(min=1, max=MAX_PAGE_SIZE))
+    projection = DelimitedList(
+        fields.Str(validate=OneOf(RECEIPT_FIELDS)),
+        data_key="fields",
+        validate=Length(min=1),
+    )
+
+
+class ReceiptExportQuerySchema(ReceiptFilterSchema):
+    format = fields.Str(load_default="ndjson", validate=OneOf(["ndjson", "csv"]))
+    gzip = fields.Bool(load_default=False)
@@ -0,0 +1,115 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", "10"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", "3"))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", "30"))
+
+# Services the gateway proxies to. Each of them can override the defaults above
+# with <NAME>_POOL_SIZE, <NAME>_CONNECT_TIMEOUT and <NAME>_READ_TIMEOUT.
+UPSTREAM_NAMES = ["AUTH_SERVICE", "SHOP_SERVICE", "ITEM_SERVICE", "REPORT_SERVICE"]
+
+# Headers which describe the incoming connection or body and must not be
+# forwarded over a reused keep-alive connection.
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "content-length",
+    "host",
+    "keep-alive",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class UpstreamSettings:
+    def __init__(self, pool_size, connect_timeout, read_timeout):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    @classmethod
+    def from_env(cls, name):
+        return cls(
+            pool_size=int(os.environ.get(f"{name}_POOL_SIZE", UPSTREAM_POOL_SIZE)),
+            connect_timeout=float(
+                os.environ.get(f"{name}_CONNECT_TIMEOUT", UPSTREAM_CONNECT_TIMEOUT)
+            ),
+            read_timeout=float(
+                os.environ.get(f"{name}_READ_TIMEOUT", UPSTREAM_READ_TIMEOUT)
+            ),
+        )
+
+
+class UpstreamSessionPool:
+    """
+    Keeps one keep-alive requests.Session per upstream origin, so proxied calls
+    reuse TCP connections instead of opening a new one for every hop.
+    """
+
+    def __init__(self, upstream_names=UPSTREAM_NAMES):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.settings = {}
+        for name in upstream_names:
+            url = os.environ.get(f"{name}_URL")
+            if url:
+                self.settings[_origin(url)] = UpstreamSettings.from_env(name)
+        self.default_settings = UpstreamSettings(
+            UPSTREAM_POOL_SIZE, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT
+        )
+
+    def _get_settings(self, origin):
+        return self.settings.get(origin, self.default_settings)
+
+    def _create_session(self, origin):
+        settings = self._get_settings(origin)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.pool_size)
+        session.mount(origin, adapter)
+        return session
+
+    def get_session(self, url):
+        origin = _origin(url)
+        session = self.sessions.get(origin)
+        if session is None:
+            with self.lock:
+                session = self.sessions.get(origin)
+                if session is None:
+                    session = self._create_session(origin)
+                    self.sessions[origin] = session
+        return session
+
+    def request(self, method, url, headers=None, **kwargs):
+        if headers:
+            headers = {
+                key: value
+                for key, value in headers.items()
+                if key.lower() not in HOP_BY_HOP_HEADERS
+            }
+        kwargs.setdefault("timeout", self._get_settings(_origin(url)).timeout)
+        return self.get_session(url).request(method, url, headers=headers, **kwargs)
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+
+UPSTREAMS = UpstreamSessionPool()
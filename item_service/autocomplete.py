@@ -0,0 +1,165 @@
+import bisect
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from db import db
+from models import ItemModel
+
+AUTOCOMPLETE_MAX_SHOPS = int(os.environ.get("AUTOCOMPLETE_MAX_SHOPS", "64"))
+# Upper bound of staleness if the items are changed bypassing this process
+AUTOCOMPLETE_TTL = float(os.environ.get("AUTOCOMPLETE_TTL", "300"))
+
+# The same folding as item_name_normalize() in the database
+_FOLDED_LETTERS = str.maketrans({"ґ": "г"})
+
+
+def normalize_name(name):
+    """Lower case without diacritics, й, ї and ё become и, і and е."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    ).translate(_FOLDED_LETTERS)
+
+
+def _name_keys(name):
+    """The whole name and the rest of it from the start of every other word."""
+    words = normalize_name(name).split()
+    return " ".join(words), [" ".join(words[index:]) for index in range(1, len(words))]
+
+
+def _remove(keys, key):
+    index = bisect.bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        del keys[index]
+
+
+def _starting_with(keys, prefix):
+    index = bisect.bisect_left(keys, (prefix,))
+    while index < len(keys) and keys[index][0].startswith(prefix):
+        yield keys[index][1]
+        index += 1
+
+
+class ShopNames:
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+        # Sorted (key, item id) pairs of whole names and of names from their
+        # second, third etc. word, so "біл" finds "Хліб білий" too
+        self.name_keys = []
+        self.word_keys = []
+        self.names = {}
+
+    def add(self, item_id, name, sort=True):
+        self.names[item_id] = name
+        name_key, word_keys = _name_keys(name)
+        if not sort:
+            self.name_keys.append((name_key, item_id))
+            self.word_keys.extend((key, item_id) for key in word_keys)
+            return
+        bisect.insort(self.name_keys, (name_key, item_id))
+        for key in word_keys:
+            bisect.insort(self.word_keys, (key, item_id))
+
+    def remove(self, item_id):
+        name = self.names.pop(item_id, None)
+        if name is None:
+            return
+        name_key, word_keys = _name_keys(name)
+        _remove(self.name_keys, (name_key, item_id))
+        for key in word_keys:
+            _remove(self.word_keys, (key, item_id))
+
+    def complete(self, prefix, limit):
+        """Names starting with the prefix first, then the ones with a word."""
+        prefix = " ".join(normalize_name(prefix).split())
+        if not prefix:
+            return []
+        found = {}
+        for keys in (self.name_keys, self.word_keys):
+            for item_id in _starting_with(keys, prefix):
+                if len(found) == limit:
+                    break
+                found[item_id] = None
+        return [{"id": item_id, "item_name": self.names[item_id]} for item_id in found]
+
+
+class ItemNameAutocomplete:
+    """
+    Per-shop sorted array of normalized item names for typing-ahead at the
+    till. Prefixes are found with a binary search, so completion takes
+    microseconds and doesn't touch the database. A shop is loaded with one
+    query on first use and then updated in place with item_added(),
+    item_renamed() and item_removed() after the changes are committed.
+    Changes made by other processes show up once the shop expires.
+    """
+
+    def __init__(self, max_shops=AUTOCOMPLETE_MAX_SHOPS, ttl=AUTOCOMPLETE_TTL):
+        self.max_shops = max_shops
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.shops = OrderedDict()
+        # Bumped on every change, so a load which raced with a change is dropped
+        self.generations = {}
+
+    def _get_shop(self, shop_id):
+        with self.lock:
+            shop = self.shops.get(shop_id)
+            if shop is not None and shop.expires_at > time.monotonic():
+                self.shops.move_to_end(shop_id)
+                return shop
+            generation = self.generations.get(shop_id, 0)
+
+        shop = ShopNames(time.monotonic() + self.ttl)
+        for item_id, item_name in db.session.query(
+            ItemModel.id, ItemModel.item_name
+        ).filter(ItemModel.shop_id == shop_id):
+            shop.add(item_id, item_name, sort=False)
+        shop.name_keys.sort()
+        shop.word_keys.sort()
+
+        with self.lock:
+            if self.generations.get(shop_id, 0) == generation:
+                self.shops[shop_id] = shop
+                self.shops.move_to_end(shop_id)
+                while len(self.shops) > self.max_shops:
+                    self.shops.popitem(last=False)
+        return shop
+
+    def _changed(self, shop_id):
+        self.generations[shop_id] = self.generations.get(shop_id, 0) + 1
+        return self.shops.get(shop_id)
+
+    def complete(self, shop_id, prefix, limit):
+        shop = self._get_shop(shop_id)
+        with self.lock:
+            return shop.complete(prefix, limit)
+
+    def item_added(self, shop_id, item_id, name):
+        with self.lock:
+            shop = self._changed(shop_id)
+            if shop is not None:
+                shop.add(item_id, name)
+
+    def item_renamed(self, shop_id, item_id, name):
+        with self.lock:
+            shop = self._changed(shop_id)
+            if shop is not None:
+                shop.remove(item_id)
+                shop.add(item_id, name)
+
+    def item_removed(self, shop_id, item_id):
+        with self.lock:
+            shop = self._changed(shop_id)
+            if shop is not None:
+                shop.remove(item_id)
+
+    def invalidate(self, shop_id):
+        with self.lock:
+            self._changed(shop_id)
+            self.shops.pop(shop_id, None)
+
+
+ITEM_NAMES = ItemNameAutocomplete()
@@ -0,0 +1,95 @@
+"""
+Benchmark of item name search over a generated catalog, milliseconds per query.
+
+"like" is the search before the trigram index: item_name LIKE '%...%'.
+Needs DATABASE_URI of a Postgres database migrated with `flask db upgrade`.
+The generated shop and its items are deleted afterwards.
+
+    python bench_search.py [items, at most 99999]
+"""
+
+import random
+import sys
+import time
+
+from app import create_app
+from db import db
+from models import ItemFolderModel, ItemModel
+from search import filter_by_name
+from sqlalchemy import insert
+
+BENCH_SHOP_ID = 999_999_999
+QUERIES = ["молоко", "Молоко", "малоко", "хліб", "ЙОГУРТ", "сир 45", "чай зел"]
+REPETITIONS = 20
+
+WORDS = [
+    "Молоко",
+    "Хліб",
+    "Сир",
+    "Йогурт",
+    "Чай",
+    "Кава",
+    "Масло",
+    "Ковбаса",
+    "Печиво",
+    "Сік",
+]
+ADJECTIVES = ["білий", "зелений", "чорний", "житній", "вершкове", "твердий", "їжакове"]
+
+
+def generate_items(folder_id, count):
+    for index in range(count):
+        word = WORDS[index % len(WORDS)]
+        adjective = ADJECTIVES[index // len(WORDS) % len(ADJECTIVES)]
+        yield {
+            "item_name": f"{word} {adjective} {index} {random.randint(1, 99)}%",
+            "shop_id": BENCH_SHOP_ID,
+            "type": "COMMODITY",
+            "unit": "PIECE",
+            "price": 10,
+            "count_existing": 0,
+            "article": index + 1,
+            "bar_code": 10**12 + index,
+            "folder_id": folder_id,
+        }
+
+
+def bench(name, search):
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(REPETITIONS):
+            found = search(query)
+        elapsed = (time.perf_counter() - started) / REPETITIONS * 1000
+        print(f"{name:>8} {query!r:>12}: {elapsed:8.2f} ms, {len(found)} found")
+
+
+if __name__ == "__main__":
+    # Articles have 5 digits, so that's the largest possible shop catalog
+    items_count = min(int(sys.argv[1]) if len(sys.argv) > 1 else 99_999, 99_999)
+    app = create_app()
+    with app.app_context():
+        folder = ItemFolderModel(folder_name="bench", shop_id=BENCH_SHOP_ID)
+        db.session.add(folder)
+        db.session.commit()
+        db.session.execute(
+            insert(ItemModel), list(generate_items(folder.id, items_count))
+        )
+        db.session.commit()
+        db.session.execute(db.text("ANALYZE items"))
+
+        shop_items = ItemModel.query.filter(ItemModel.shop_id == BENCH_SHOP_ID)
+        try:
+            bench(
+                "like",
+                lambda query: shop_items.filter(ItemModel.item_name.like(f"%{query}%"))
+                .limit(5)
+                .all(),
+            )
+            bench(
+                "trigram",
+                lambda query: filter_by_name(shop_items, query).limit(5).all(),
+            )
+        finally:
+            ItemModel.query.filter(ItemModel.folder_id == folder.id).delete()
+            db.session.delete(folder)
+            db.session.commit()
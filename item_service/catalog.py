@@ -0,0 +1,44 @@
+from db import db
+from models import CatalogVersionModel
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def get_catalog_version(shop_id):
+    version = (
+        db.session.query(CatalogVersionModel.version)
+        .filter(CatalogVersionModel.shop_id == shop_id)
+        .scalar()
+    )
+    return version or 0
+
+
+def bump_catalog_version(shop_id):
+    """
+    Bumps the version of the shop items and folders in the current transaction,
+    so it's committed together with the change. Has to be called right before
+    the commit of every change of the shop catalog, as the row stays locked
+    until then.
+    """
+    dialect = postgresql if db.engine.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(CatalogVersionModel).values(shop_id=shop_id, version=1)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[CatalogVersionModel.shop_id],
+            set_={"version": CatalogVersionModel.version + 1},
+        )
+    )
+
+
+def catalog_etag_data(shop_id, kind, params):
+    """
+    ETag data of a list of the shop catalog: it only changes with the catalog
+    version, so an unchanged list is answered with 304 before it's queried.
+    Counts of items aren't versioned, as every receipt changes them, so the
+    lists leave them out (see CatalogItemSchema) and /item/counts has them.
+    """
+    return {
+        "shop_id": shop_id,
+        "kind": kind,
+        "version": get_catalog_version(shop_id),
+        "params": params,
+    }
@@ -0,0 +1,116 @@
+"""
+Checks that the number of SQL statements of the list, search and detail
+endpoints doesn't grow with the number of items, e.g. through lazy loads of
+relationships. Items are spread over the folders one by one, so every page has
+items of every folder and a lazy load of folders goes over the budget.
+
+Statements of every endpoint are counted with a before_cursor_execute listener
+and printed, the exit code is 1 if any endpoint goes over its budget.
+Needs DATABASE_URI of a database migrated with `flask db upgrade`.
+The generated shop and its items are deleted afterwards.
+
+    python check_queries.py
+"""
+
+import sys
+
+from app import create_app
+from db import db
+from models import ItemFolderModel, ItemModel
+from sqlalchemy import event, insert
+
+CHECK_SHOP_ID = 999_999_998
+FOLDERS_COUNT = 10
+ITEMS_PER_FOLDER = 20
+
+# Catalog version, the page and the relationships loaded with it
+STATEMENT_BUDGETS = {
+    "item list": 2,
+    "folder list": 2,
+    "folder list with items": 3,
+    "item search": 1,
+    "item detail": 2,
+}
+
+
+def generate_items(folder_ids):
+    for number in range(len(folder_ids) * ITEMS_PER_FOLDER):
+        yield {
+            "item_name": f"Check {number}",
+            "shop_id": CHECK_SHOP_ID,
+            "type": "COMMODITY",
+            "unit": "PIECE",
+            "price": 10,
+            "count_existing": 0,
+            "article": number + 1,
+            "bar_code": 10**12 + number,
+            "folder_id": folder_ids[number % len(folder_ids)],
+        }
+
+
+def get_endpoints(item_id):
+    return {
+        "item list": f"/shop/{CHECK_SHOP_ID}/item",
+        "folder list": f"/shop/{CHECK_SHOP_ID}/folder?with_items=false",
+        "folder list with items": f"/shop/{CHECK_SHOP_ID}/folder?with_items=true",
+        "item search": f"/shop/{CHECK_SHOP_ID}/item/search?name_part=Check",
+        "item detail": f"/item/{item_id}?shop_id={CHECK_SHOP_ID}",
+    }
+
+
+def count_statements(app, item_id):
+    """Statements of every endpoint, each requested in its own app context."""
+    statements = []
+    with app.app_context():
+        event.listen(
+            db.engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+    client = app.test_client()
+    counts = {}
+    for name, url in get_endpoints(item_id).items():
+        statements.clear()
+        status_code = client.get(url).status_code
+        counts[name] = (status_code, len(statements))
+    return counts
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        folders = [
+            ItemFolderModel(folder_name=f"check {index}", shop_id=CHECK_SHOP_ID)
+            for index in range(FOLDERS_COUNT)
+        ]
+        db.session.add_all(folders)
+        db.session.commit()
+        folder_ids = [folder.id for folder in folders]
+        db.session.execute(insert(ItemModel), list(generate_items(folder_ids)))
+        db.session.commit()
+        item_id = (
+            db.session.query(ItemModel.id)
+            .filter(ItemModel.shop_id == CHECK_SHOP_ID)
+            .limit(1)
+            .scalar()
+        )
+
+    try:
+        counts = count_statements(app, item_id)
+    finally:
+        with app.app_context():
+            ItemModel.query.filter(ItemModel.shop_id == CHECK_SHOP_ID).delete()
+            ItemFolderModel.query.filter(
+                ItemFolderModel.shop_id == CHECK_SHOP_ID
+            ).delete()
+            db.session.commit()
+
+    over_budget = 0
+    for name, (status_code, count) in counts.items():
+        budget = STATEMENT_BUDGETS[name]
+        if status_code != 200 or count > budget:
+            over_budget += 1
+        print(f"{name}: {status_code}, {count} statements, budget {budget}")
+
+    print(f"{over_budget} of {len(counts)} endpoints go over the budget")
+    sys.exit(1 if over_budget else 0)
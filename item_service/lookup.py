@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from models import ItemModel
+from schemas import ItemReturnSchema
+from sqlalchemy.orm import joinedload
+
+LOOKUP_INDEX_MAX_SHOPS = int(os.environ.get("LOOKUP_INDEX_MAX_SHOPS", "64"))
+# Upper bound of staleness if the items are changed bypassing this process
+LOOKUP_INDEX_TTL = float(os.environ.get("LOOKUP_INDEX_TTL", "300"))
+
+
+class ShopItems:
+    def __init__(self, items, expires_at):
+        self.expires_at = expires_at
+        self.items = {item["id"]: item for item in items}
+        self.by_bar_code = {item["bar_code"]: item["id"] for item in items}
+        self.by_article = {item["article"]: item["id"] for item in items}
+
+
+class ItemLookupIndex:
+    """
+    Per-shop in-memory index of items by bar code and by article for exact
+    lookups at the till. A shop is loaded with one query on its first lookup,
+    after that lookups don't touch the database until the shop is invalidated.
+
+    Items are kept serialized with ItemReturnSchema, so they can be returned
+    as they are. Every change of the shop items has to be reported with
+    invalidate() or apply_count_deltas() after the commit.
+    """
+
+    def __init__(self, max_shops=LOOKUP_INDEX_MAX_SHOPS, ttl=LOOKUP_INDEX_TTL):
+        self.max_shops = max_shops
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.shops = OrderedDict()
+        # Bumped on every change, so a load which raced with a change is dropped
+        self.generations = {}
+
+    def _get_shop(self, shop_id):
+        with self.lock:
+            shop = self.shops.get(shop_id)
+            if shop is not None and shop.expires_at > time.monotonic():
+                self.shops.move_to_end(shop_id)
+                return shop
+            generation = self.generations.get(shop_id, 0)
+
+        items = ItemModel.query.options(joinedload(ItemModel.folder)).filter(
+            ItemModel.shop_id == shop_id
+        )
+        shop = ShopItems(
+            ItemReturnSchema(many=True).dump(items), time.monotonic() + self.ttl
+        )
+
+        with self.lock:
+            if self.generations.get(shop_id, 0) == generation:
+                self.shops[shop_id] = shop
+                self.shops.move_to_end(shop_id)
+                while len(self.shops) > self.max_shops:
+                    self.shops.popitem(last=False)
+        return shop
+
+    def get_by_bar_code(self, shop_id, bar_code):
+        shop = self._get_shop(shop_id)
+        return shop.items.get(shop.by_bar_code.get(bar_code))
+
+    def get_by_article(self, shop_id, article):
+        shop = self._get_shop(shop_id)
+        return shop.items.get(shop.by_article.get(article))
+
+    def invalidate(self, shop_id):
+        with self.lock:
+            self.generations[shop_id] = self.generations.get(shop_id, 0) + 1
+            self.shops.pop(shop_id, None)
+
+    def apply_count_deltas(self, shop_id, deltas):
+        """
+        Mirrors a committed update of count_existing, so that selling items
+        doesn't drop the whole shop from the index.
+        """
+        with self.lock:
+            self.generations[shop_id] = self.generations.get(shop_id, 0) + 1
+            shop = self.shops.get(shop_id)
+            if shop is None:
+                return
+            for item_id, delta in deltas.items():
+                item = shop.items.get(item_id)
+                if item is not None:
+                    item["count_existing"] = (item["count_existing"] or 0) + delta
+
+
+ITEM_INDEX = ItemLookupIndex()
@@ -0,0 +1,51 @@
+"""item name search
+
+Revision ID: 3f6c2b9e8d41
+Revises: 1aebaa3a29a5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c2b9e8d41'
+down_revision = '1aebaa3a29a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trigram search is Postgres only, other databases keep the LIKE search
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    # Lower case without diacritics, also folds ґ, ї, й, ё into г, і, и, е.
+    # unaccent() itself isn't immutable, so it can't be used in an index
+    # directly, the wrapper with the dictionary given explicitly can.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION item_name_normalize(text) RETURNS text
+        LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+            SELECT translate(
+                lower(public.unaccent('public.unaccent'::regdictionary, $1)),
+                'ґїйё',
+                'гіие'
+            )
+        $$
+        """
+    )
+    op.execute(
+        'CREATE INDEX items_name_trgm_index ON items '
+        'USING gin (item_name_normalize(item_name) gin_trgm_ops)'
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS items_name_trgm_index')
+    op.execute('DROP FUNCTION IF EXISTS item_name_normalize(text)')
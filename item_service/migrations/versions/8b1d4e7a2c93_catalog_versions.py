@@ -0,0 +1,28 @@
+"""catalog versions
+
+Revision ID: 8b1d4e7a2c93
+Revises: 3f6c2b9e8d41
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1d4e7a2c93'
+down_revision = '3f6c2b9e8d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_versions',
+    sa.Column('shop_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('shop_id')
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_versions')
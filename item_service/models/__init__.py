@@ -1,2 +1,3 @@
 from models.item import ItemModel, ItemTypeEnum, UnitsEnum
 from models.folder import ItemFolderModel
+from models.catalog_version import CatalogVersionModel
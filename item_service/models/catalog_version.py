@@ -0,0 +1,8 @@
+from db import db
+
+
+class CatalogVersionModel(db.Model):
+    __tablename__ = "catalog_versions"
+
+    shop_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -11,7 +11,7 @@ class ItemFolderModel(db.Model):
     items = db.relationship(
         "ItemModel",
         back_populates="folder",
-        lazy="dynamic",
+        lazy="select",
         cascade="all, delete-orphan",
     )
 
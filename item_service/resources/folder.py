@@ -1,14 +1,20 @@
+from catalog import bump_catalog_version, catalog_etag_data
 from db import db
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
+from lookup import ITEM_INDEX
 from models import ItemFolderModel, ItemModel
+from resources.utils import paginate
 from schemas import (
+    CatalogFolderSchema,
     FolderCreateSchema,
     FolderEditSchema,
+    FolderListQuerySchema,
     FolderReturnSchema,
     MessageOnlySchema,
     ShopIDSchema,
 )
+from sqlalchemy.orm import selectinload
 
 blp = Blueprint("Folder", "folder", description="Operations on item folders")
 
@@ -28,6 +34,7 @@ class FolderCreate(MethodView):
 
         folder = ItemFolderModel(**folder_data)
         db.session.add(folder)
+        bump_catalog_version(folder.shop_id)
         db.session.commit()
 
         return {"id": folder.id, "message": "Folder created successfully."}
@@ -35,11 +42,29 @@ class FolderCreate(MethodView):
 
 @blp.route("/shop/<int:shop_id>/folder")
 class FolderList(MethodView):
+    @blp.etag
+    @blp.arguments(FolderListQuerySchema, location="query")
     @blp.response(
-        200, FolderReturnSchema(many=True), description="Folders returned successfully."
+        200,
+        CatalogFolderSchema(many=True),
+        description="Folders returned successfully.",
     )
-    def get(self, shop_id):
-        return ItemFolderModel.query.filter(ItemFolderModel.shop_id == shop_id).all()
+    def get(self, page_params, shop_id):
+        blp.set_etag(catalog_etag_data(shop_id, "folders", page_params))
+        if page_params["with_items"]:
+            # Items of the whole page are loaded with one extra query
+            query = ItemFolderModel.query.options(selectinload(ItemFolderModel.items))
+        else:
+            # Plain rows without the items relationship, so items aren't dumped
+            query = db.session.query(
+                ItemFolderModel.id, ItemFolderModel.folder_name, ItemFolderModel.shop_id
+            )
+        folders, headers = paginate(
+            query.filter(ItemFolderModel.shop_id == shop_id),
+            ItemFolderModel.id,
+            page_params,
+        )
+        return folders, 200, headers
 
 
 @blp.route("/folder/<int:folder_id>")
@@ -77,7 +102,10 @@ class Folder(MethodView):
         if "new_folder_name" in folder_edit_data:
             folder.folder_name = folder_edit_data["new_folder_name"]
 
+        bump_catalog_version(shop_id)
         db.session.commit()
+        # Indexed items carry the folder name
+        ITEM_INDEX.invalidate(shop_id)
         return folder
 
     @blp.arguments(ShopIDSchema, location="query")
@@ -95,6 +123,7 @@ class Folder(MethodView):
             abort(409, message="Folder still contains items.")
 
         db.session.delete(folder)
+        bump_catalog_version(shop_id)
         db.session.commit()
 
         return {"message": "Folder deleted successfully."}
@@ -1,22 +1,307 @@
+import csv
+import io
+import json
 import os
 
+from autocomplete import ITEM_NAMES
+from catalog import bump_catalog_version, catalog_etag_data
 from db import db
+from flask import Response, request, stream_with_context
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
+from lookup import ITEM_INDEX
+from marshmallow import ValidationError
 from models import ItemFolderModel, ItemModel, ItemTypeEnum
+from resources.utils import paginate
 from schemas import (
+    CatalogItemSchema,
+    ItemAutocompleteQuerySchema,
+    ItemBulkReportSchema,
     ItemCountEditSchema,
+    ItemCountSchema,
     ItemCreateSchema,
     ItemEditSchema,
+    ItemExportQuerySchema,
+    ItemLookupSchema,
+    ItemNameSchema,
     ItemReturnSchema,
     ItemSearchSchema,
     MessageOnlySchema,
+    PageQuerySchema,
     ShopIDSchema,
 )
+from search import filter_by_name
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 blp = Blueprint("Item", "item", description="Operations on items")
 
 MAX_SEARCH_VARIANTS = int(os.environ.get("MAX_SEARCH_VARS", "5"))
+BULK_IMPORT_CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FIELDS = [
+    "id",
+    "item_name",
+    "price",
+    "count_existing",
+    "type",
+    "unit",
+    "article",
+    "bar_code",
+    "folder_id",
+    "folder_name",
+]
+
+# Fields which are unique in a shop, in the order conflicts are reported
+DUPLICATE_MESSAGES = [
+    ("article", "There is already an item with this article in the shop."),
+    ("bar_code", "There is already an item with this bar code in the shop."),
+    ("item_name", "There is already an item with this name in the shop."),
+]
+
+# Unique constraints of items as Postgres names them, see the items migration
+UNIQUE_CONSTRAINT_FIELDS = {
+    "items_shop_id_article_key": "article",
+    "items_shop_id_bar_code_key": "bar_code",
+    "items_shop_id_item_name_key": "item_name",
+}
+SQLITE_UNIQUE_ERROR = "UNIQUE constraint failed: "
+
+
+def check_duplicates(shop_id, values, exclude_id=None):
+    """
+    Aborts with 409 if another item of the shop has one of the unique values.
+    All the fields are checked with one query.
+    """
+    values = {field: value for field, value in values.items() if value is not None}
+    if not values:
+        return
+
+    query = db.session.query(
+        ItemModel.article, ItemModel.bar_code, ItemModel.item_name
+    ).filter(
+        ItemModel.shop_id == shop_id,
+        db.or_(
+            *(getattr(ItemModel, field) == value for field, value in values.items())
+        ),
+    )
+    if exclude_id is not None:
+        query = query.filter(ItemModel.id != exclude_id)
+    # Every field is unique, so there is at most one conflicting item per field
+    conflicts = query.limit(len(values)).all()
+
+    for field, message in DUPLICATE_MESSAGES:
+        if field in values and any(
+            getattr(conflict, field) == values[field] for conflict in conflicts
+        ):
+            abort(409, message=message)
+
+
+def get_duplicate_field(error):
+    """
+    Unique field of the item violated by an IntegrityError, None if it's
+    another violation, e.g. of a foreign key or NOT NULL. Postgres reports the
+    constraint name, SQLite only the columns of the constraint.
+    """
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None:
+        return UNIQUE_CONSTRAINT_FIELDS.get(diag.constraint_name)
+    message = str(error.orig)
+    if not message.startswith(SQLITE_UNIQUE_ERROR):
+        return None
+    columns = message[len(SQLITE_UNIQUE_ERROR) :].split(", ")
+    for field, _ in DUPLICATE_MESSAGES:
+        if columns == ["items.shop_id", f"items.{field}"]:
+            return field
+    return None
+
+
+def commit_items(shop_id):
+    """
+    Commits the session with a new catalog version of the shop and maps unique
+    constraint violations, e.g. from a concurrent insert which passed
+    check_duplicates at the same time, to 409.
+    """
+    try:
+        bump_catalog_version(shop_id)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        field = get_duplicate_field(e)
+        if field is None:
+            raise
+        abort(409, message=dict(DUPLICATE_MESSAGES)[field])
+
+
+def read_bulk_rows():
+    """
+    Yields rows of a bulk import body, which is either a JSON array, NDJSON
+    (application/x-ndjson) or CSV with a header line (text/csv). NDJSON and CSV
+    bodies are read line by line.
+    """
+    if request.mimetype == "text/csv":
+        for row in csv.DictReader(io.TextIOWrapper(request.stream, "utf-8-sig")):
+            # Empty cells are fields which weren't given
+            yield {
+                key: value
+                for key, value in row.items()
+                if key is not None and value not in (None, "")
+            }
+    elif request.mimetype == "application/x-ndjson":
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Not a dict, so the schema reports it as invalid input
+                yield line.decode(errors="replace")
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            abort(400, message="Expected a JSON array, NDJSON or CSV body.")
+        yield from rows
+
+
+def import_items_chunk(shop_id, chunk, folder_ids, report):
+    """
+    Validates a chunk of (row number, row) pairs and inserts the valid rows
+    with one bulk insert. Invalid rows are added to the report with errors.
+    """
+    schema = ItemCreateSchema()
+    loaded = []
+    for row_number, row in chunk:
+        if isinstance(row, dict):
+            row = {**row, "shop_id": shop_id}
+        try:
+            loaded.append((row_number, schema.load(row)))
+        except ValidationError as e:
+            report["errors"].append({"row": row_number, "errors": e.messages})
+
+    # Unique values already used in the shop, one query for the whole chunk
+    taken = {field: set() for field, _ in DUPLICATE_MESSAGES}
+    if loaded:
+        existing = db.session.query(
+            ItemModel.article, ItemModel.bar_code, ItemModel.item_name
+        ).filter(
+            ItemModel.shop_id == shop_id,
+            db.or_(
+                *(
+                    getattr(ItemModel, field).in_(
+                        {item_data[field] for _, item_data in loaded}
+                    )
+                    for field in taken
+                )
+            ),
+        )
+        for conflict in existing:
+            for field in taken:
+                taken[field].add(getattr(conflict, field))
+
+    rows = []
+    for row_number, item_data in loaded:
+        errors = {}
+        for field, message in DUPLICATE_MESSAGES:
+            if item_data[field] in taken[field]:
+                errors[field] = [message]
+        if item_data["folder_id"] not in folder_ids:
+            errors["folder_id"] = ["Desired folder wasn't found in the shop."]
+        if item_data["type"] == "SERVICE" and item_data.get("unit", "PIECE") != "PIECE":
+            errors["unit"] = ["Services are only counted in pieces"]
+
+        if errors:
+            report["errors"].append({"row": row_number, "errors": errors})
+            continue
+        for field in taken:
+            taken[field].add(item_data[field])
+        rows.append((row_number, {"unit": "PIECE", **item_data, "count_existing": 0}))
+
+    if not rows:
+        return
+    try:
+        db.session.execute(insert(ItemModel), [item_data for _, item_data in rows])
+        bump_catalog_version(shop_id)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if get_duplicate_field(e) is None:
+            raise
+        # Someone else created one of the items meanwhile
+        report["errors"].extend(
+            {
+                "row": row_number,
+                "errors": {
+                    "_schema": ["The item conflicts with another item in the shop."]
+                },
+            }
+            for row_number, _ in rows
+        )
+        return
+    report["created"] += len(rows)
+    ITEM_INDEX.invalidate(shop_id)
+    ITEM_NAMES.invalidate(shop_id)
+
+
+def export_rows(shop_id):
+    """
+    Yields batches of the shop items as plain dicts, fetched through a server
+    side cursor, so the whole catalog is never loaded at once.
+    """
+    query = (
+        select(
+            ItemModel.id,
+            ItemModel.item_name,
+            ItemModel.price,
+            ItemModel.count_existing,
+            ItemModel.type,
+            ItemModel.unit,
+            ItemModel.article,
+            ItemModel.bar_code,
+            ItemModel.folder_id,
+            ItemFolderModel.folder_name,
+        )
+        .join(ItemFolderModel, ItemModel.folder_id == ItemFolderModel.id)
+        .where(ItemModel.shop_id == shop_id)
+        .order_by(ItemModel.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for batch in db.session.execute(query).partitions():
+        yield [
+            {
+                "id": row.id,
+                "item_name": row.item_name,
+                "price": str(row.price),
+                "count_existing": row.count_existing,
+                "type": row.type.name,
+                "unit": row.unit.name if row.unit else None,
+                "article": int(row.article),
+                "bar_code": int(row.bar_code) if row.bar_code is not None else None,
+                "folder_id": row.folder_id,
+                "folder_name": row.folder_name,
+            }
+            for row in batch
+        ]
+
+
+def generate_ndjson(shop_id):
+    for batch in export_rows(shop_id):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch)
+
+
+def generate_csv(shop_id):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    # The header goes out before the first query is done
+    yield buffer.getvalue()
+    for batch in export_rows(shop_id):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
 
 
 @blp.route("/item")
@@ -26,27 +311,14 @@ class ItemCreate(MethodView):
     @blp.alt_response(404, description="Folder with that id wasn't found.")
     @blp.alt_response(409, description="There is an item like this in the shop.")
     def post(self, item_data):
-        if ItemModel.query.filter(
-            ItemModel.shop_id == item_data["shop_id"],
-            ItemModel.article == item_data["article"],
-        ).first():
-            abort(
-                409, message="There is already an item with this article in the shop."
-            )
-
-        if ItemModel.query.filter(
-            ItemModel.shop_id == item_data["shop_id"],
-            ItemModel.bar_code == item_data["bar_code"],
-        ).first():
-            abort(
-                409, message="There is already an item with this bar code in the shop."
-            )
-
-        if ItemModel.query.filter(
-            ItemModel.shop_id == item_data["shop_id"],
-            ItemModel.item_name == item_data["item_name"],
-        ).first():
-            abort(409, message="There is already an item with this name in the shop.")
+        check_duplicates(
+            item_data["shop_id"],
+            {
+                "article": item_data["article"],
+                "bar_code": item_data["bar_code"],
+                "item_name": item_data["item_name"],
+            },
+        )
 
         folder = ItemFolderModel.query.get_or_404(
             item_data["folder_id"], description="Desired folder wasn't found."
@@ -70,18 +342,106 @@ class ItemCreate(MethodView):
             count_existing=0,
         )
         db.session.add(item)
-        db.session.commit()
+        commit_items(item.shop_id)
+        ITEM_INDEX.invalidate(item.shop_id)
+        ITEM_NAMES.item_added(item.shop_id, item.id, item.item_name)
 
         return {"id": item.id, "message": "Item created successfully."}
 
 
 @blp.route("/shop/<int:shop_id>/item")
 class ItemList(MethodView):
+    @blp.etag
+    @blp.arguments(PageQuerySchema, location="query")
     @blp.response(
-        200, ItemReturnSchema(many=True), description="Items returned successfully."
+        200, CatalogItemSchema(many=True), description="Items returned successfully."
     )
-    def get(self, shop_id):
-        return ItemModel.query.filter(ItemModel.shop_id == shop_id).all()
+    def get(self, page_params, shop_id):
+        blp.set_etag(catalog_etag_data(shop_id, "items", page_params))
+        items, headers = paginate(
+            ItemModel.query.options(joinedload(ItemModel.folder)).filter(
+                ItemModel.shop_id == shop_id
+            ),
+            ItemModel.id,
+            page_params,
+        )
+        return items, 200, headers
+
+
+@blp.route("/shop/<int:shop_id>/item/counts")
+class ItemCountList(MethodView):
+    @blp.arguments(PageQuerySchema, location="query")
+    @blp.response(
+        200, ItemCountSchema(many=True), description="Counts returned successfully."
+    )
+    def get(self, page_params, shop_id):
+        """
+        Current counts of the shop items. Unlike the item list they aren't
+        cached with the catalog version, as every receipt changes them.
+        """
+        counts, headers = paginate(
+            db.session.query(ItemModel.id, ItemModel.count_existing).filter(
+                ItemModel.shop_id == shop_id
+            ),
+            ItemModel.id,
+            page_params,
+        )
+        return counts, 200, headers
+
+
+@blp.route("/shop/<int:shop_id>/item/bulk")
+class ItemBulkCreate(MethodView):
+    @blp.response(200, ItemBulkReportSchema, description="Items imported.")
+    @blp.alt_response(400, description="Body is not a JSON array, NDJSON or CSV.")
+    def post(self, shop_id):
+        """
+        Creates many items at once. Rows are validated like in POST /item and
+        inserted in chunks, invalid rows are skipped and reported with errors.
+        """
+        folder_ids = {
+            folder_id
+            for (folder_id,) in db.session.query(ItemFolderModel.id).filter(
+                ItemFolderModel.shop_id == shop_id
+            )
+        }
+
+        report = {"created": 0, "errors": []}
+        chunk = []
+        for row_number, row in enumerate(read_bulk_rows(), start=1):
+            chunk.append((row_number, row))
+            if len(chunk) == BULK_IMPORT_CHUNK_SIZE:
+                import_items_chunk(shop_id, chunk, folder_ids, report)
+                chunk = []
+        if chunk:
+            import_items_chunk(shop_id, chunk, folder_ids, report)
+
+        report["errors"].sort(key=lambda error: error["row"])
+        report["failed"] = len(report["errors"])
+        return report
+
+
+@blp.route("/shop/<int:shop_id>/item/export")
+class ItemExport(MethodView):
+    @blp.arguments(ItemExportQuerySchema, location="query")
+    @blp.response(200, description="Items streamed as NDJSON or CSV.")
+    def get(self, export_params, shop_id):
+        """
+        Streams the whole shop catalog, rows are written as they are fetched.
+        """
+        if export_params["format"] == "csv":
+            return Response(
+                stream_with_context(generate_csv(shop_id)),
+                mimetype="text/csv",
+                headers={
+                    "Content-Disposition": (
+                        f"attachment; filename=shop_{shop_id}_items.csv"
+                    )
+                },
+            )
+        return Response(
+            stream_with_context(generate_ndjson(shop_id)),
+            mimetype="application/x-ndjson",
+        )
 
 
 @blp.route("/item/<int:item_id>")
@@ -112,36 +472,15 @@ class Item(MethodView):
         if item.shop_id != shop_id:
             abort(401, message="You must be shop staff member!")
 
-        if (
-            "new_article" in item_edit_data
-            and ItemModel.query.filter(
-                ItemModel.shop_id == item.shop_id,
-                ItemModel.article == item_edit_data["new_article"],
-            ).first()
-        ):
-            abort(
-                409, message="There is already an item with this article in the shop."
-            )
-
-        if (
-            "new_bar_code" in item_edit_data
-            and ItemModel.query.filter(
-                ItemModel.shop_id == item.shop_id,
-                ItemModel.bar_code == item_edit_data["new_bar_code"],
-            ).first()
-        ):
-            abort(
-                409, message="There is already an item with this bar code in the shop."
-            )
-
-        if (
-            "new_item_name" in item_edit_data
-            and ItemModel.query.filter(
-                ItemModel.shop_id == item.shop_id,
-                ItemModel.item_name == item_edit_data["new_item_name"],
-            ).first()
-        ):
-            abort(409, message="There is already an item with this name in the shop.")
+        check_duplicates(
+            item.shop_id,
+            {
+                "article": item_edit_data.get("new_article"),
+                "bar_code": item_edit_data.get("new_bar_code"),
+                "item_name": item_edit_data.get("new_item_name"),
+            },
+            exclude_id=item.id,
+        )
 
         if "new_folder_id" in item_edit_data:
             new_folder = ItemFolderModel.query.get(item_edit_data["new_folder_id"])
@@ -170,7 +509,10 @@ class Item(MethodView):
             item.unit = item_edit_data["new_unit"]
 
         db.session.add(item)
-        db.session.commit()
+        commit_items(item.shop_id)
+        ITEM_INDEX.invalidate(item.shop_id)
+        if "new_item_name" in item_edit_data:
+            ITEM_NAMES.item_renamed(item.shop_id, item.id, item.item_name)
 
         return item
 
@@ -184,7 +526,10 @@ class Item(MethodView):
         if item.shop_id != shop_id:
             abort(401, message="You must be shop staff member!")
         db.session.delete(item)
+        bump_catalog_version(shop_id)
         db.session.commit()
+        ITEM_INDEX.invalidate(shop_id)
+        ITEM_NAMES.item_removed(shop_id, item_id)
         return {"message": "Item deleted."}
 
 
@@ -196,20 +541,84 @@ class ItemCounts(MethodView):
     @blp.alt_response(404, description="One of the items wasn't found.")
     def put(self, items_count_edit_data, shop_id_data):
         shop_id = shop_id_data["shop_id"]
+        deltas = {}
         for item_count_data in items_count_edit_data:
-            item = ItemModel.query.get(item_count_data["id"])
+            item_id = item_count_data["id"]
+            deltas[item_id] = deltas.get(item_id, 0) + item_count_data["count_delta"]
+        if not deltas:
+            return {"message": "Counts updated successfully."}
+
+        # Rows are locked in id order, so concurrent receipts with overlapping
+        # items wait for each other instead of deadlocking or losing updates
+        items = (
+            db.session.query(ItemModel.id, ItemModel.shop_id, ItemModel.type)
+            .filter(ItemModel.id.in_(deltas))
+            .order_by(ItemModel.id)
+            .with_for_update()
+            .all()
+        )
+        found = {item.id: item for item in items}
+        for item_id in deltas:
+            item = found.get(item_id)
             if item is None:
-                abort(404, message=f"Item with ID {item_count_data['id']} not found.")
+                db.session.rollback()
+                abort(404, message=f"Item with ID {item_id} not found.")
             if item.shop_id != shop_id:
+                db.session.rollback()
                 abort(401, message="Items should belong to your store!")
             if item.type == ItemTypeEnum.SERVICE:
+                db.session.rollback()
                 abort(409, message="Services count can't be changed.")
-            item.count_existing += item_count_data["count_delta"]
 
+        ItemModel.query.filter(ItemModel.id.in_(deltas)).update(
+            {
+                ItemModel.count_existing: db.func.coalesce(ItemModel.count_existing, 0)
+                + db.case(deltas, value=ItemModel.id)
+            },
+            synchronize_session=False,
+        )
         db.session.commit()
+        ITEM_INDEX.apply_count_deltas(shop_id, deltas)
         return {"message": "Counts updated successfully."}
 
 
+@blp.route("/shop/<int:shop_id>/item/lookup")
+class ItemLookup(MethodView):
+    @blp.arguments(ItemLookupSchema, location="query")
+    @blp.response(200, ItemReturnSchema, description="Item returned successfully.")
+    @blp.alt_response(404, description="Item wasn't found.")
+    @blp.alt_response(409, description="Exactly one of article, bar_code is needed.")
+    def get(self, lookup_params, shop_id):
+        """
+        Exact lookup of an item by bar code or article for the till, served
+        from the in-memory index of the shop.
+        """
+        if len(lookup_params) != 1:
+            abort(409, message="Exactly one of {article, bar_code} should be given.")
+
+        if "bar_code" in lookup_params:
+            item = ITEM_INDEX.get_by_bar_code(shop_id, lookup_params["bar_code"])
+        else:
+            item = ITEM_INDEX.get_by_article(shop_id, lookup_params["article"])
+        if item is None:
+            abort(404, message="Item wasn't found.")
+        return item
+
+
+@blp.route("/shop/<int:shop_id>/item/autocomplete")
+class ItemAutocomplete(MethodView):
+    @blp.arguments(ItemAutocompleteQuerySchema, location="query")
+    @blp.response(200, ItemNameSchema(many=True), description="Names returned.")
+    def get(self, autocomplete_params, shop_id):
+        """
+        Items whose name or one of its words starts with the prefix, ignoring
+        case and diacritics. Names starting with the prefix go first.
+        """
+        return ITEM_NAMES.complete(
+            shop_id, autocomplete_params["prefix"], autocomplete_params["limit"]
+        )
+
+
 @blp.route("/shop/<int:shop_id>/item/search")
 class ItemSearch(MethodView):
     @blp.arguments(ItemSearchSchema, location="query")
@@ -241,14 +650,13 @@ class ItemSearch(MethodView):
             )
         else:
             items = ItemModel.query.filter(ItemModel.shop_id == shop_id)
+        items = items.options(joinedload(ItemModel.folder))
 
         if "article" in item_search_params:
             items = items.filter(ItemModel.article == item_search_params["article"])
         elif "bar_code" in item_search_params:
             items = items.filter(ItemModel.bar_code == item_search_params["bar_code"])
         elif "name_part" in item_search_params:
-            items = items.filter(
-                ItemModel.item_name.like("%" + item_search_params["name_part"] + "%")
-            )
+            items = filter_by_name(items, item_search_params["name_part"])
 
         return items.limit(MAX_SEARCH_VARIANTS).all()
@@ -0,0 +1,24 @@
+NEXT_AFTER_ID_HEADER = "X-Next-After-Id"
+
+
+def paginate(query, id_column, page_params):
+    """
+    Keyset pagination of a query by id: the page starts right after after_id
+    and has up to limit rows. When the page is full, the id to continue from is
+    returned in the X-Next-After-Id header. Without limit all the rows after
+    after_id are returned, as before pagination was added.
+
+    Returns the rows and the response headers.
+    """
+    if "after_id" in page_params:
+        query = query.filter(id_column > page_params["after_id"])
+    query = query.order_by(id_column)
+
+    if "limit" not in page_params:
+        return query.all(), {}
+
+    rows = query.limit(page_params["limit"]).all()
+    headers = {}
+    if len(rows) == page_params["limit"]:
+        headers[NEXT_AFTER_ID_HEADER] = str(rows[-1].id)
+    return rows, headers
@@ -0,0 +1,39 @@
+from db import db
+from models import ItemModel
+from sqlalchemy import String, func, literal
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filter_by_name(query, name_part):
+    """
+    Filters an ItemModel query by a part of the item name and orders it by
+    relevance: names starting with name_part go first, then the ones which are
+    most similar to it.
+
+    On Postgres matching ignores case and diacritics and tolerates typos in a
+    word, using the trigram index over item_name_normalize(item_name) created
+    by the 3f6c2b9e8d41 migration. Other databases get a plain ILIKE.
+    """
+    pattern = _escape_like(name_part)
+    if db.engine.dialect.name != "postgresql":
+        return query.filter(
+            ItemModel.item_name.ilike(f"%{pattern}%", escape="\\")
+        ).order_by(ItemModel.item_name)
+
+    name = func.item_name_normalize(ItemModel.item_name)
+    search = func.item_name_normalize(name_part)
+    pattern = func.item_name_normalize(pattern, type_=String)
+    return query.filter(
+        db.or_(
+            name.like(literal("%").concat(pattern).concat("%"), escape="\\"),
+            # Similar to a word of the name, e.g. "малоко" finds "Молоко 2.5%"
+            search.op("<%")(name),
+        )
+    ).order_by(
+        name.like(pattern.concat("%"), escape="\\").desc(),
+        func.word_similarity(search, name).desc(),
+        ItemModel.item_name,
+    )
@@ -1,12 +1,14 @@
 import os
 
-import pika
 from callbacks import create_callback_receipt, create_callback_report
+from consumer import ConsumerWorkerPool
 from dotenv import load_dotenv
-from flask import Flask, render_template
+from flask import Flask
 from flask.views import MethodView
 from flask_mail import Mail, Message
 from flask_smorest import Api, Blueprint, abort
+from mailer import SMTPConnectionPool
+from rendering import EmailRenderer
 from redis import Redis
 from schemas import ReceiptSchema, ReceiverEmailSchema, ReportSchema
 
@@ -44,6 +46,8 @@ app.config["MAIL_PASSWORD"] = os.environ.get("MAIL_PASSWORD")
 app.config["MAIL_USE_TLS"] = True
 app.config["MAIL_USE_SSL"] = False
 mail = Mail(app)
+mailer = SMTPConnectionPool(mail)
+renderer = EmailRenderer(app)
 
 app.logger.info(os.environ.get("MAIL_PASSWORD"))
 
@@ -89,22 +93,10 @@ class SendReceipt(MethodView):
             recipients=[email_data["email"]],
         )
 
-        for item in receipt_data["items"]:
-            item["item_sum"] = "{0:.2f}".format(item["count"] * float(item["price"]))
-
-        fee = "{0:.2f}".format(float(receipt_data["sum"]) * 0.2)
-        # receipt_datetime = datetime.fromisoformat(receipt_data["datetime"])
-        fancy_datetime = receipt_data["datetime"].strftime("%d.%m.%y %H:%M:%S")
-
-        msg.html = render_template(
-            "receipt.html",
-            **receipt_data,
-            fee=fee,
-            fancy_datetime=fancy_datetime,
-        )
+        msg.html = renderer.render_receipt(receipt_data)
 
         # msg.body = "Hello Flask message sent from Flask-Mail"
-        mail.send(msg)
+        mailer.send(msg)
         redis_client_receipts.set(receipt_id, 1)
         return "Sent", 200
 
@@ -119,8 +111,6 @@ class SendReport(MethodView):
             abort(400, message="Email is already sent")
 
         fancy_datetime = report_data["datetime"].strftime("%d.%m.%y %H:%M:%S")
-        fancy_date = report_data["datetime"].strftime("%d.%m.%y")
-        fancy_time = report_data["datetime"].strftime("%H:%M:%S")
 
         msg = Message(
             f"Z-звіт за {fancy_datetime}",
@@ -128,60 +118,34 @@ class SendReport(MethodView):
             recipients=[email_data["email"]],
         )
 
-        msg.html = render_template(
-            "zreport.html",
-            **report_data,
-            fancy_datetime=fancy_datetime,
-            fancy_date=fancy_date,
-            fancy_time=fancy_time,
-        )
+        msg.html = renderer.render_report(report_data)
 
-        mail.send(msg)
+        mailer.send(msg)
         redis_client_reports.set(report_fn, 1)
         return "Sent", 200
 
 
-api.register_blueprint(EmailBlueprint)
-
+@EmailBlueprint.route("/smtp_stats")
+class SMTPStats(MethodView):
+    def get(self):
+        return {"connections": mailer.stats()}, 200
 
-app.logger.info(" Connecting to rabbitMQ ...")
 
-RABBIT_HOST = os.environ.get("RABBIT_HOST", "localhost")
-RABBIT_PORT = os.environ.get("RABBIT_PORT", 5672)
-RABBIT_USER = os.environ.get("RABBIT_USER", "guest")
-RABBIT_PASSWORD = os.environ.get("RABBIT_PASSWORD", "guest")
-
-with app.app_context():
-    try:
-        credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASSWORD)
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials
-            )
-        )
+api.register_blueprint(EmailBlueprint)
 
-        channel = connection.channel()
-        channel.queue_declare(queue="task_queue", durable=True)
 
-        app.logger.info(" Waiting for messages...")
+app.logger.info(" Connecting to rabbitMQ ...")
 
-        channel.basic_qos(prefetch_count=1)
-        channel.basic_consume(
-            queue="receipt_queue",
-            on_message_callback=create_callback_receipt(
-                app, redis_client_receipts, mail
-            ),
-        )
-        channel.basic_consume(
-            queue="report_queue",
-            on_message_callback=create_callback_report(
-                app, redis_client_receipts, mail
-            ),
-        )
-        channel.start_consuming()
-    except pika.exceptions.AMQPConnectionError:
-        app.logger.warning(
-            "Failed to connect to RabbitMQ service. Message wont be sent."
-        )
-    except Exception as e:
-        app.logger.warn(f"Unexpected exception: {e}")
+consumers = ConsumerWorkerPool(
+    app,
+    {
+        "receipt_queue": create_callback_receipt(
+            app, redis_client_receipts, mailer, renderer
+        ),
+        "report_queue": create_callback_report(
+            app, redis_client_reports, mailer, renderer
+        ),
+    },
+)
+consumers.run()
+mailer.close()
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark of receipt email rendering, messages per second.
+
+"render_template" is how emails were rendered before EmailRenderer: the whole
+document (head and body) through flask's render_template for every message.
+
+    python bench_rendering.py [messages] [items per receipt]
+"""
+
+import sys
+import time
+
+from flask import Flask, render_template
+from rendering import HEAD_TEMPLATE, RECEIPT_TEMPLATE, EmailRenderer, receipt_context
+
+
+def make_receipt(index, items_count):
+    return {
+        "_id": f"receipt-{index}",
+        "fn": 1,
+        "shop": {"name": "Shop", "legal_entity": "LLC", "address": "Street 1"},
+        "seller": {"name": "Name", "surname": "Surname"},
+        "sell_type": "CASH",
+        "sum": "123.40",
+        "datetime": "2023-05-01T10:00:00",
+        "items": [
+            {"item_name": f"Item {i}", "count": i % 3 + 1, "price": "10.50"}
+            for i in range(items_count)
+        ],
+    }
+
+
+def bench(name, render, receipts):
+    started = time.perf_counter()
+    render(receipts)
+    elapsed = time.perf_counter() - started
+    print(f"{name:>16}: {len(receipts) / elapsed:10.0f} messages/s")
+
+
+def render_with_render_template(receipts):
+    return [
+        render_template(HEAD_TEMPLATE)
+        + render_template(RECEIPT_TEMPLATE, **receipt_context(receipt))
+        for receipt in receipts
+    ]
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    items_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    receipts = [make_receipt(i, items_count) for i in range(messages)]
+
+    app = Flask(__name__)
+    renderer = EmailRenderer(app)
+    with app.app_context():
+        bench("render_template", render_with_render_template, receipts)
+        bench("render_receipts", renderer.render_receipts, receipts)
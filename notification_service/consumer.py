@@ -0,0 +1,149 @@
+import functools
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+
+RABBIT_HOST = os.environ.get("RABBIT_HOST", "localhost")
+RABBIT_PORT = os.environ.get("RABBIT_PORT", 5672)
+RABBIT_USER = os.environ.get("RABBIT_USER", "guest")
+RABBIT_PASSWORD = os.environ.get("RABBIT_PASSWORD", "guest")
+
+CONSUMER_WORKERS = int(os.environ.get("CONSUMER_WORKERS", "4"))
+CONSUMER_PREFETCH = int(os.environ.get("CONSUMER_PREFETCH", "16"))
+CONSUMER_RECONNECT_DELAY = float(os.environ.get("CONSUMER_RECONNECT_DELAY", "5"))
+
+
+class ConsumerWorkerPool:
+    """
+    Consumes queues on one connection and hands every message to a pool of
+    worker threads, so a slow SMTP send doesn't block the other messages.
+
+    Handlers get the message body and return True to ack it or False to reject
+    it. A message is acked only after its handler is done, i.e. the mail was
+    handed off to the SMTP server. On SIGTERM/SIGINT consuming stops and the
+    messages which are already in the workers are finished and acked before
+    the connection is closed.
+    """
+
+    def __init__(
+        self,
+        app,
+        handlers: dict,
+        workers: int = CONSUMER_WORKERS,
+        prefetch: int = CONSUMER_PREFETCH,
+    ):
+        self.app = app
+        self.handlers = handlers
+        self.workers = workers
+        self.prefetch = prefetch
+        self.connection = None
+        self.channel = None
+        self.executor = None
+        self.stopping = False
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._on_signal)
+            signal.signal(signal.SIGINT, self._on_signal)
+
+        while not self.stopping:
+            try:
+                self._consume()
+            except pika.exceptions.AMQPConnectionError:
+                self.app.logger.warning(
+                    "Failed to connect to RabbitMQ service. "
+                    f"Retrying in {CONSUMER_RECONNECT_DELAY} seconds."
+                )
+                time.sleep(CONSUMER_RECONNECT_DELAY)
+
+    def stop(self):
+        self.stopping = True
+        connection = self.connection
+        if connection is not None and connection.is_open:
+            connection.add_callback_threadsafe(self._stop_consuming)
+
+    def _on_signal(self, signum, frame):
+        self.app.logger.info("Stopping consumers, finishing in-flight messages...")
+        self.stop()
+
+    def _stop_consuming(self):
+        if self.channel is not None and self.channel.is_open:
+            self.channel.stop_consuming()
+
+    def _consume(self):
+        credentials = pika.PlainCredentials(RABBIT_USER, RABBIT_PASSWORD)
+        self.connection = pika.BlockingConnection(
+            pika.ConnectionParameters(
+                host=RABBIT_HOST, port=RABBIT_PORT, credentials=credentials
+            )
+        )
+        self.channel = self.connection.channel()
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        for queue, handler in self.handlers.items():
+            self.channel.queue_declare(queue=queue, durable=True)
+            self.channel.basic_consume(
+                queue=queue,
+                on_message_callback=functools.partial(self._on_message, handler),
+            )
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="consumer"
+        )
+        self.app.logger.info(f" Waiting for messages with {self.workers} workers...")
+        try:
+            if not self.stopping:
+                self.channel.start_consuming()
+        finally:
+            # Let the workers finish and keep the connection serving their acks
+            while self.in_flight > 0 and self.connection.is_open:
+                self.connection.process_data_events(time_limit=0.1)
+            self.executor.shutdown(wait=True)
+            if self.connection.is_open:
+                self.connection.process_data_events(time_limit=0)
+                self.connection.close()
+            self.connection = None
+            self.channel = None
+
+    def _on_message(self, handler, channel, method, properties, body):
+        with self.in_flight_lock:
+            self.in_flight += 1
+        self.executor.submit(self._handle, handler, channel, method, body)
+
+    def _handle(self, handler, channel, method, body):
+        try:
+            with self.app.app_context():
+                ack = handler(body)
+            settle = functools.partial(
+                self._settle, channel, method.delivery_tag, ack, False
+            )
+        except Exception as e:
+            self.app.logger.warning(f"Failed to handle message: {e}")
+            # Give the message one more try before dropping it
+            settle = functools.partial(
+                self._settle,
+                channel,
+                method.delivery_tag,
+                False,
+                not method.redelivered,
+            )
+
+        connection = self.connection
+        if connection is not None and connection.is_open:
+            connection.add_callback_threadsafe(settle)
+        with self.in_flight_lock:
+            self.in_flight -= 1
+
+    def _settle(self, channel, delivery_tag, ack, requeue):
+        if not channel.is_open:
+            # The broker redelivers unacked messages after a reconnect
+            return
+        if ack:
+            channel.basic_ack(delivery_tag=delivery_tag)
+        else:
+            channel.basic_reject(delivery_tag=delivery_tag, requeue=requeue)
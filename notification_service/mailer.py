@@ -0,0 +1,134 @@
+import os
+import queue
+import smtplib
+import time
+
+from flask_mail import Connection, Mail, Message
+
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "4"))
+# Connections are reopened after this many messages or seconds of idling,
+# servers tend to drop long-living or quiet sessions on their own.
+SMTP_MAX_MESSAGES = int(os.environ.get("SMTP_MAX_MESSAGES", "100"))
+SMTP_IDLE_TIMEOUT = float(os.environ.get("SMTP_IDLE_TIMEOUT", "60"))
+SMTP_SEND_RETRIES = int(os.environ.get("SMTP_SEND_RETRIES", "1"))
+
+# Errors after which the connection is useless and has to be reopened.
+# Other SMTP errors (refused recipients etc.) are about the message itself.
+RECONNECT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class PooledConnection:
+    def __init__(self, mail: Mail, index: int):
+        self.index = index
+        self.connection = Connection(mail)
+        self.opened = False
+        self.last_used = 0.0
+        self.messages_on_connection = 0
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+        self.send_time = 0.0
+
+    def open(self):
+        if self.opened:
+            self.close()
+        # Connects, does STARTTLS and logs in
+        self.connection.__enter__()
+        self.opened = True
+        self.connects += 1
+        self.last_used = time.monotonic()
+        self.messages_on_connection = 0
+
+    def close(self):
+        host = self.connection.host
+        self.connection.host = None
+        self.opened = False
+        if host is None:
+            return
+        try:
+            host.quit()
+        except (smtplib.SMTPException, OSError):
+            host.close()
+
+    def is_usable(self):
+        return (
+            self.opened
+            and self.messages_on_connection < SMTP_MAX_MESSAGES
+            and time.monotonic() - self.last_used < SMTP_IDLE_TIMEOUT
+        )
+
+    def send(self, msg: Message):
+        started = time.monotonic()
+        self.connection.send(msg)
+        self.last_used = time.monotonic()
+        self.send_time += self.last_used - started
+        self.messages_on_connection += 1
+        self.sent += 1
+
+    def stats(self):
+        return {
+            "connection": self.index,
+            "open": self.opened,
+            "sent": self.sent,
+            "failed": self.failed,
+            "connects": self.connects,
+            "messages_per_second": (
+                self.sent / self.send_time if self.send_time else 0.0
+            ),
+        }
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to SMTP_POOL_SIZE authenticated SMTP connections open and sends
+    messages over them, instead of connecting, doing STARTTLS and logging in
+    for every email like mail.send() does.
+
+    Connections are opened lazily and the most recently used one is handed out
+    first, so under low load a single connection does all the work and the
+    rest stay closed. A connection which was dropped by the server is reopened
+    and the message is sent once again.
+    """
+
+    def __init__(self, mail: Mail, size: int = SMTP_POOL_SIZE):
+        self.connections = [PooledConnection(mail, index) for index in range(size)]
+        self.idle = queue.LifoQueue()
+        for connection in reversed(self.connections):
+            self.idle.put(connection)
+
+    def send(self, msg: Message):
+        self.send_many([msg])
+
+    def send_many(self, messages):
+        """Sends all the messages over one connection."""
+        connection = self.idle.get()
+        try:
+            for msg in messages:
+                self._send(connection, msg)
+        finally:
+            self.idle.put(connection)
+
+    def _send(self, connection: PooledConnection, msg: Message):
+        for attempt in range(SMTP_SEND_RETRIES + 1):
+            try:
+                if not connection.is_usable():
+                    connection.open()
+                connection.send(msg)
+                return
+            except RECONNECT_ERRORS:
+                connection.failed += 1
+                connection.close()
+                if attempt == SMTP_SEND_RETRIES:
+                    raise
+
+    def stats(self):
+        return [connection.stats() for connection in self.connections]
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
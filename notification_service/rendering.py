@@ -0,0 +1,77 @@
+from datetime import datetime
+
+from flask import Flask
+
+# Doctype and <head> with the inline CSS, shared by all emails. It has no
+# variables, so it is rendered only once.
+HEAD_TEMPLATE = "email_head.html"
+RECEIPT_TEMPLATE = "receipt.html"
+REPORT_TEMPLATE = "zreport.html"
+
+
+def _to_datetime(value):
+    # Queue messages carry ISO strings, HTTP bodies are loaded by marshmallow
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def receipt_context(receipt: dict) -> dict:
+    price_sums = [item["count"] * float(item["price"]) for item in receipt["items"]]
+    items = [
+        {**item, "item_sum": f"{item_sum:.2f}"}
+        for item, item_sum in zip(receipt["items"], price_sums)
+    ]
+    return {
+        **receipt,
+        "items": items,
+        "fee": f"{float(receipt['sum']) * 0.2:.2f}",
+        "fancy_datetime": _to_datetime(receipt["datetime"]).strftime(
+            "%d.%m.%y %H:%M:%S"
+        ),
+    }
+
+
+def report_context(report: dict) -> dict:
+    report_datetime = _to_datetime(report["datetime"])
+    return {
+        **report,
+        "fancy_datetime": report_datetime.strftime("%d.%m.%y %H:%M:%S"),
+        "fancy_date": report_datetime.strftime("%d.%m.%y"),
+        "fancy_time": report_datetime.strftime("%H:%M:%S"),
+    }
+
+
+class EmailRenderer:
+    """
+    Renders receipt and Z-report emails with templates which are loaded and
+    compiled once at startup. Most of every email is the static head with
+    the CSS, which is rendered once too, so per message only the body with
+    the receipt or the report data is rendered and glued to it.
+
+    Rendering doesn't need an app or request context, the input dicts are
+    not modified.
+    """
+
+    def __init__(self, app: Flask):
+        env = app.jinja_env
+        self.head = env.get_template(HEAD_TEMPLATE).render()
+        self.receipt_template = env.get_template(RECEIPT_TEMPLATE)
+        self.report_template = env.get_template(REPORT_TEMPLATE)
+
+    def _render(self, template, context):
+        return f"{self.head}\n{template.render(context)}"
+
+    def render_receipt(self, receipt: dict) -> str:
+        return self._render(self.receipt_template, receipt_context(receipt))
+
+    def render_receipts(self, receipts) -> list:
+        template = self.receipt_template
+        return [self._render(template, receipt_context(r)) for r in receipts]
+
+    def render_report(self, report: dict) -> str:
+        return self._render(self.report_template, report_context(report))
+
+    def render_reports(self, reports) -> list:
+        template = self.report_template
+        return [self._render(template, report_context(r)) for r in reports]
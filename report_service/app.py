@@ -1,9 +1,11 @@
 import os
 
+from commands import indexes_cli, shifts_cli
 from db import db
 from dotenv import load_dotenv
 from flask import Flask
 from flask_smorest import Api
+from indexes import ensure_indexes
 from resources import ReceiptBlueprint, ReportBlueprint, ShiftBlueprint
 
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
@@ -24,10 +26,17 @@ def create_app():
     app.config["PROPAGATE_EXCEPTIONS"] = True
     db.init_app(app)
 
+    if os.environ.get("ENSURE_INDEXES", "1") == "1":
+        for error in ensure_indexes():
+            app.logger.error("Index wasn't created: %s", error)
+
     api = Api(app)
 
     api.register_blueprint(ShiftBlueprint)
     api.register_blueprint(ReceiptBlueprint)
     api.register_blueprint(ReportBlueprint)
 
+    app.cli.add_command(shifts_cli)
+    app.cli.add_command(indexes_cli)
+
     return app
@@ -0,0 +1,133 @@
+"""
+Checks that no query of the endpoints falls back to a collection scan and that
+receipt pages and exports are read in the order of the *_datetime_id indexes.
+
+Every query is explained against DATABASE_URI after the indexes are ensured
+(see indexes.py), the winning plan stages are printed and the exit code is 1
+if any of them is a COLLSCAN or a sorted query has a SORT stage, i.e. sorts in
+memory. Nothing but indexes is written to the database.
+
+    python check_indexes.py
+"""
+
+import sys
+from datetime import datetime
+
+from app import create_app
+from bson.objectid import ObjectId
+from db import db
+from reporting import get_shift_receipts_filter
+from resources.receipt import RECEIPTS_SORT, get_page_query, get_receipts_query
+
+SHOP_ID = 1
+SHIFT = {"shop_id": SHOP_ID, "open_time": datetime(2023, 6, 1, 8)}
+AFTER = {"_id": ObjectId(), "datetime": datetime(2023, 6, 15)}
+
+FIND_QUERIES = [
+    ("shifts", {"shop_id": SHOP_ID, "status": "opened"}),
+    ("receipts", {"_id": ObjectId()}),
+    ("reports", {"type": "X", "shop_id": SHOP_ID}),
+    ("reports", {"type": "Z", "shop_id": SHOP_ID}),
+    ("reports", {"type": "Z", "fn": 10**12}),
+] + [
+    ("receipts", get_receipts_query(SHOP_ID, params))
+    for params in [
+        {},
+        {"id": str(ObjectId())},
+        {"datetime_start": datetime(2023, 6, 1), "datetime_end": datetime(2023, 7, 1)},
+        {"item_id": 1},
+        {"seller_id": 1},
+        {"seller_id": 1, "datetime_start": datetime(2023, 6, 1)},
+        {"sell_type": "CASH"},
+        {"item_name_part": "Молоко"},
+    ]
+]
+
+# Searches served in RECEIPTS_SORT order by the *_datetime_id indexes. Searches by
+# id and item_id use other indexes, so their few receipts are sorted in memory.
+SORTED_QUERIES = [
+    ("receipts", query)
+    for search in [
+        get_receipts_query(SHOP_ID, params)
+        for params in [
+            {},
+            {
+                "datetime_start": datetime(2023, 6, 1),
+                "datetime_end": datetime(2023, 7, 1),
+            },
+            {"seller_id": 1},
+            {"seller_id": 1, "datetime_start": datetime(2023, 6, 1)},
+            {"sell_type": "CASH"},
+            {"item_name_part": "Молоко"},
+        ]
+    ]
+    # The first page and the export, then a page after the AFTER receipt
+    for query in [search, get_page_query(search, AFTER)]
+]
+
+# Opened and closed shifts without running totals and a shift with them
+AGGREGATIONS = [
+    ("receipts", [{"$match": get_shift_receipts_filter(shift)}])
+    for shift in [
+        SHIFT,
+        {**SHIFT, "close_time": datetime(2023, 6, 1, 20)},
+        {**SHIFT, "_id": ObjectId(), "totals": {}},
+    ]
+]
+
+
+def get_plan_stages(explanation):
+    """Stages of all the winning plans in an explain() output."""
+    stages = []
+    if isinstance(explanation, dict):
+        for key, value in explanation.items():
+            if key == "stage":
+                stages.append(value)
+            elif key != "rejectedPlans":
+                stages.extend(get_plan_stages(value))
+    elif isinstance(explanation, list):
+        for value in explanation:
+            stages.extend(get_plan_stages(value))
+    return stages
+
+
+if __name__ == "__main__":
+    app = create_app()
+    failed = 0
+    with app.app_context():
+        explanations = (
+            [
+                (collection, query, False, db.db[collection].find(query).explain())
+                for collection, query in FIND_QUERIES
+            ]
+            + [
+                (
+                    collection,
+                    query,
+                    True,
+                    db.db[collection].find(query).sort(RECEIPTS_SORT).explain(),
+                )
+                for collection, query in SORTED_QUERIES
+            ]
+            + [
+                (
+                    collection,
+                    pipeline,
+                    False,
+                    db.db.command(
+                        "aggregate", collection, pipeline=pipeline, explain=True
+                    ),
+                )
+                for collection, pipeline in AGGREGATIONS
+            ]
+        )
+
+    for collection, query, is_sorted, explanation in explanations:
+        stages = get_plan_stages(explanation)
+        if "COLLSCAN" in stages or (is_sorted and "SORT" in stages):
+            failed += 1
+        sort = " sorted" if is_sorted else ""
+        print(f"{collection} {query}{sort}: {' <- '.join(stages)}")
+
+    print(f"{failed} of {len(explanations)} queries scan a collection or sort")
+    sys.exit(1 if failed else 0)
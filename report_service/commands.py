@@ -0,0 +1,94 @@
+import math
+
+import click
+from bson.decimal128 import Decimal128
+from db import db
+from flask.cli import AppGroup
+from indexes import ensure_indexes
+from reporting import compute_shift_totals, get_shift_totals
+
+shifts_cli = AppGroup("shifts", help="Maintenance of shifts.")
+indexes_cli = AppGroup("indexes", help="MongoDB indexes.")
+
+
+def get_totals_corrections(totals, computed_totals):
+    """Increments which turn the running totals into the computed ones."""
+    corrections = {}
+    for field in ("receipts_count", "cash_sum", "card_sum"):
+        if totals[field] != computed_totals[field]:
+            corrections[field] = computed_totals[field] - totals[field]
+    for item_id in totals["items"].keys() | computed_totals["items"].keys():
+        count = totals["items"].get(item_id, 0)
+        computed_count = computed_totals["items"].get(item_id, 0)
+        if not math.isclose(count, computed_count, abs_tol=1e-9):
+            corrections[f"items.{item_id}"] = computed_count - count
+    return corrections
+
+
+@shifts_cli.command("reconcile")
+@click.option("--shop-id", type=int, help="Only check shifts of this shop.")
+@click.option("--closed", is_flag=True, help="Check closed shifts as well.")
+@click.option("--fix", is_flag=True, help="Correct the running totals.")
+def reconcile(shop_id, closed, fix):
+    """
+    Recomputes totals of shifts from their receipts and compares them with the
+    running totals. Exits with 1 if some of them differ and --fix isn't given.
+    A receipt which is being created during the check can show up as a false
+    difference of an opened shift, so check again before fixing opened shifts.
+    """
+    query = {"totals": {"$exists": True}}
+    if shop_id is not None:
+        query["shop_id"] = shop_id
+    if not closed:
+        query["status"] = "opened"
+
+    checked = 0
+    differing = 0
+    for shift in db.db.shifts.find(query):
+        checked += 1
+        corrections = get_totals_corrections(
+            get_shift_totals(shift), compute_shift_totals(shift)
+        )
+        if not corrections:
+            continue
+
+        differing += 1
+        click.echo(
+            f"Shift {shift['_id']} of shop {shift['shop_id']}: "
+            + ", ".join(
+                f"{field} {correction:+}" for field, correction in corrections.items()
+            )
+        )
+        if fix:
+            # Corrected with $inc, so receipts counted meanwhile aren't lost
+            db.db.shifts.update_one(
+                {"_id": shift["_id"]},
+                {
+                    "$inc": {
+                        f"totals.{field}": (
+                            Decimal128(str(correction))
+                            if field.endswith("_sum")
+                            else correction
+                        )
+                        for field, correction in corrections.items()
+                    }
+                },
+            )
+
+    click.echo(
+        f"{checked} shifts checked, {differing} differ"
+        + (" and are fixed." if fix else ".")
+    )
+    if differing and not fix:
+        raise SystemExit(1)
+
+
+@indexes_cli.command("ensure")
+def ensure():
+    """Creates the missing indexes, exits with 1 if some of them can't be."""
+    errors = ensure_indexes()
+    for error in errors:
+        click.echo(error, err=True)
+    if errors:
+        raise SystemExit(1)
+    click.echo("Indexes are up to date.")
@@ -0,0 +1,65 @@
+from db import db
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+# Indexes of every query of the endpoints, check_indexes.py verifies them
+INDEXES = {
+    "shifts": [
+        # At most one opened shift per shop, also finds the opened shift
+        IndexModel(
+            [("shop_id", ASCENDING)],
+            name="opened_shift_unique",
+            unique=True,
+            partialFilterExpression={"status": "opened"},
+        ),
+        IndexModel([("shop_id", ASCENDING), ("status", ASCENDING)], name="shop_status"),
+    ],
+    "receipts": [
+        # Receipts of a shift, see get_shift_receipts_filter()
+        IndexModel([("shift_id", ASCENDING)], name="shift"),
+        # Receipts of a shift without running totals
+        IndexModel(
+            [("shop_id", ASCENDING), ("datetime", ASCENDING)], name="shop_datetime"
+        ),
+        # Receipt search, see get_receipts_query(). Pages are sorted by
+        # datetime and _id, see paginate_receipts()
+        IndexModel(
+            [("shop.id", ASCENDING), ("datetime", ASCENDING), ("_id", ASCENDING)],
+            name="shop_info_datetime_id",
+        ),
+        IndexModel(
+            [("shop.id", ASCENDING), ("items.id", ASCENDING)], name="shop_info_item"
+        ),
+        IndexModel(
+            [
+                ("shop.id", ASCENDING),
+                ("seller.id", ASCENDING),
+                ("datetime", ASCENDING),
+                ("_id", ASCENDING),
+            ],
+            name="shop_info_seller_datetime_id",
+        ),
+    ],
+    "reports": [
+        IndexModel([("type", ASCENDING), ("shop_id", ASCENDING)], name="type_shop"),
+        IndexModel([("type", ASCENDING), ("fn", ASCENDING)], name="type_fn"),
+    ],
+}
+
+
+def ensure_indexes():
+    """
+    Creates the missing indexes of INDEXES, existing ones are left as they are.
+    Returns the errors of indexes which couldn't be created, e.g. the unique
+    index of opened shifts while some shop has two of them.
+    """
+    errors = []
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                db.db[collection].create_indexes([index])
+            except ConnectionFailure as e:
+                return errors + [f"MongoDB is unavailable: {e}"]
+            except PyMongoError as e:
+                errors.append(f"{collection}.{index.document['name']}: {e}")
+    return errors
@@ -0,0 +1,212 @@
+from decimal import Decimal
+
+from bson.decimal128 import Decimal128
+from db import db
+from flask import current_app
+from flask_smorest import abort
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+SELL_TYPES = ["CASH", "CARD"]
+
+
+def to_decimal(value):
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    return Decimal(value)
+
+
+def get_opened_shift(shop_id, user_id):
+    """The only opened shift of the shop, which has to be opened by the user."""
+    opened_shifts = list(
+        db.db.shifts.find({"shop_id": shop_id, "status": "opened"}).limit(2)
+    )
+    if not opened_shifts:
+        abort(404, message="No shifts are opened.")
+    if len(opened_shifts) > 1:
+        abort(400, message="There shouldn't be more then 1 shifts opened at once.")
+    shift = opened_shifts[0]
+    if shift["seller"]["id"] != user_id:
+        abort(
+            401,
+            message="Should be the person who opened the shift to create receipts.",
+        )
+    return shift
+
+
+def new_shift_totals():
+    """Running totals of a just opened shift, see add_receipt_to_shift()."""
+    return {
+        "receipts_count": 0,
+        "cash_sum": Decimal128("0"),
+        "card_sum": Decimal128("0"),
+        "items": {},
+    }
+
+
+def get_receipt_increments(receipt, sign=1):
+    """$inc of the running totals counting the receipt, or uncounting it."""
+    increments = {
+        "totals.receipts_count": sign,
+        f"totals.{receipt['sell_type'].lower()}_sum": Decimal128(
+            sign * to_decimal(receipt["sum"])
+        ),
+    }
+    for item in receipt["items"]:
+        key = f"totals.items.{item['id']}"
+        increments[key] = increments.get(key, 0) + sign * item["count"]
+    return increments
+
+
+def add_receipt_to_shift(shift, receipt):
+    """
+    Counts a receipt in the running totals of its shift with one atomic $inc,
+    so concurrent receipts don't overwrite each other. It's done before the
+    receipt is stored: once a Z report has closed the shift, the receipt is
+    rejected instead of being stored and left out of the report. Shifts
+    opened before running totals were added have no totals and are left alone.
+    """
+    if "totals" not in shift:
+        return
+    result = db.db.shifts.update_one(
+        {"_id": shift["_id"], "status": "opened"},
+        {"$inc": get_receipt_increments(receipt)},
+    )
+    if result.matched_count == 0:
+        abort(404, message="No shifts are opened.")
+
+
+def remove_receipt_from_shift(shift, receipt):
+    """Takes back add_receipt_to_shift() of a receipt which wasn't stored."""
+    if "totals" not in shift:
+        return
+    increments = get_receipt_increments(receipt, sign=-1)
+    result = db.db.shifts.update_one(
+        {"_id": shift["_id"], "status": "opened"}, {"$inc": increments}
+    )
+    if result.matched_count == 0:
+        db.db.shifts.update_one({"_id": shift["_id"]}, {"$inc": increments})
+        current_app.logger.error(
+            f"Shift {shift['_id']} was closed with a receipt which wasn't stored, "
+            "its Z report counts the receipt."
+        )
+
+
+def close_shift(shift, close_time):
+    """Closes the shift and returns it with the totals it was closed with."""
+    closed_shift = db.db.shifts.find_one_and_update(
+        {"_id": shift["_id"], "status": "opened"},
+        {"$set": {"status": "closed", "close_time": close_time}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if closed_shift is None:
+        abort(404, message="No shifts are opened.")
+    return closed_shift
+
+
+def reopen_shift(shift):
+    """
+    Reopens a shift closed by close_shift() whose Z report failed. It's left
+    closed if another shift of the shop was opened meanwhile, as only one of
+    them can be opened, see the opened_shift_unique index.
+    """
+    try:
+        db.db.shifts.update_one(
+            {"_id": shift["_id"], "status": "closed"},
+            {"$set": {"status": "opened"}, "$unset": {"close_time": ""}},
+        )
+    except DuplicateKeyError:
+        current_app.logger.error(
+            f"Shift {shift['_id']} of shop {shift['shop_id']} can't be reopened, "
+            "another shift is opened. It stays closed without a Z report."
+        )
+
+
+def get_shift_receipts_filter(shift):
+    """
+    Receipts of shifts with running totals are the ones stored with their
+    shift_id, so backdated receipts are counted in the shift they were
+    created in. Older shifts have the receipts made while they were opened.
+    """
+    if "totals" in shift:
+        return {"shift_id": shift["_id"], "sell_type": {"$in": SELL_TYPES}}
+    receipt_datetime = {"$gt": shift["open_time"]}
+    if "close_time" in shift:
+        receipt_datetime["$lte"] = shift["close_time"]
+    return {
+        "shop_id": shift["shop_id"],
+        "datetime": receipt_datetime,
+        "sell_type": {"$in": SELL_TYPES},
+    }
+
+
+def compute_shift_totals(shift):
+    """
+    Totals of the shift computed from its receipts in one aggregation, only
+    the totals come back instead of every receipt of the shift. Used for shifts
+    without running totals and to reconcile the running totals.
+    """
+    (result,) = db.db.receipts.aggregate(
+        [
+            {"$match": get_shift_receipts_filter(shift)},
+            {
+                "$facet": {
+                    "sell_types": [
+                        {
+                            "$group": {
+                                "_id": "$sell_type",
+                                "count": {"$sum": 1},
+                                "sum": {"$sum": "$sum"},
+                            }
+                        }
+                    ],
+                    "items": [
+                        {"$unwind": "$items"},
+                        {
+                            "$group": {
+                                "_id": "$items.id",
+                                "count": {"$sum": "$items.count"},
+                            }
+                        },
+                    ],
+                }
+            },
+        ]
+    )
+
+    totals = {
+        "receipts_count": 0,
+        "cash_sum": Decimal(0),
+        "card_sum": Decimal(0),
+        "items": {str(item["_id"]): item["count"] for item in result["items"]},
+    }
+    for group in result["sell_types"]:
+        totals["receipts_count"] += group["count"]
+        totals[f"{group['_id'].lower()}_sum"] = to_decimal(group["sum"])
+    return totals
+
+
+def get_shift_totals(shift):
+    """Running totals of the shift, computed from receipts if it has none."""
+    if "totals" not in shift:
+        return compute_shift_totals(shift)
+    totals = shift["totals"]
+    return {
+        "receipts_count": totals["receipts_count"],
+        "cash_sum": to_decimal(totals["cash_sum"]),
+        "card_sum": to_decimal(totals["card_sum"]),
+        "items": totals["items"],
+    }
+
+
+def build_report(shift, report_time):
+    """The part of X and Z reports with the totals of the shift."""
+    totals = get_shift_totals(shift)
+    return {
+        "seller": shift["seller"],
+        "datetime": report_time,
+        "checks_count": totals["receipts_count"],
+        "cash_sum": totals["cash_sum"],
+        "card_sum": totals["card_sum"],
+        "sum": totals["cash_sum"] + totals["card_sum"],
+    }
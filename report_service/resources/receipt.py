@@ -1,13 +1,27 @@
+import csv
+import io
+import json
+import os
 import random
+import zlib
+from datetime import datetime
 from decimal import Decimal
 
 from bson.decimal128 import Decimal128
 from bson.objectid import ObjectId
 from db import db
+from flask import Response, stream_with_context
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
+from pymongo import ASCENDING
+from reporting import (
+    add_receipt_to_shift,
+    get_opened_shift,
+    remove_receipt_from_shift,
+)
 from schemas import (
     MessageWithIDandFNSchema,
+    ReceiptExportQuerySchema,
     ReceiptQuerySchema,
     ReceiptSchema,
     UserCheckSchema,
@@ -15,6 +29,22 @@ from schemas import (
 
 blp = Blueprint("Receipt", "receipt", description="Operations on receipts")
 
+NEXT_AFTER_ID_HEADER = "X-Next-After-Id"
+# Order of receipt pages and exports, the search indexes end with these fields
+RECEIPTS_SORT = [("datetime", ASCENDING), ("_id", ASCENDING)]
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FIELDS = [
+    "id",
+    "fn",
+    "datetime",
+    "sell_type",
+    "sum",
+    "seller_id",
+    "items_count",
+]
+
 
 def convert_decimal(dict_item):
     # This function iterates a dictionary looking for types of Decimal and converts them
@@ -28,13 +58,188 @@ def convert_decimal(dict_item):
             convert_decimal(v)
         elif isinstance(v, list):
             for item in v:
-                convert_decimal(item)
+                if isinstance(item, dict):
+                    convert_decimal(item)
         elif isinstance(v, Decimal):
             dict_item[k] = Decimal128(str(v))
 
     return dict_item
 
 
+def get_receipts_query(shop_id, query_data):
+    """Query of the receipts of the shop matching ReceiptQuerySchema params."""
+    query = {"shop.id": shop_id}
+
+    query_data = convert_decimal(query_data)
+
+    if "id" in query_data:
+        query["_id"] = ObjectId(query_data["id"])
+
+    if "datetime_start" in query_data:
+        if "datetime_end" in query_data:
+            query["datetime"] = {
+                "$gte": query_data["datetime_start"],
+                "$lte": query_data["datetime_end"],
+            }
+        else:
+            query["datetime"] = {
+                "$gte": query_data["datetime_start"],
+            }
+    elif "datetime_end" in query_data:
+        query["datetime"] = {
+            "$lte": query_data["datetime_end"],
+        }
+
+    if "sum_start" in query_data:
+        if "sum_end" in query_data:
+            query["sum"] = {
+                "$gte": query_data["sum_start"],
+                "$lte": query_data["sum_end"],
+            }
+        else:
+            query["sum"] = {
+                "$gte": query_data["sum_start"],
+            }
+    elif "sum_end" in query_data:
+        query["sum"] = {
+            "$lte": query_data["sum_end"],
+        }
+
+    if "item_id" in query_data:
+        query["items.id"] = query_data["item_id"]
+
+    if "seller_id" in query_data:
+        query["seller.id"] = query_data["seller_id"]
+
+    if "sell_type" in query_data:
+        query["sell_type"] = query_data["sell_type"]
+
+    if "item_name_part" in query_data:
+        query["items.item_name"] = {"$regex": query_data["item_name_part"]}
+
+    return query
+
+
+def get_page_query(query, after):
+    """Receipts of the query which go after the after receipt in RECEIPTS_SORT."""
+    return {
+        "$and": [
+            query,
+            # Bounds the index scan, the $or skips the receipts of the
+            # same datetime which were on the previous page
+            {"datetime": {"$gte": after["datetime"]}},
+            {
+                "$or": [
+                    {"datetime": {"$gt": after["datetime"]}},
+                    {"_id": {"$gt": after["_id"]}},
+                ]
+            },
+        ]
+    }
+
+
+def paginate_receipts(shop_id, query, query_data):
+    """
+    Keyset pagination of receipts by (datetime, _id): the page starts right
+    after the after_id receipt and has up to limit receipts. When the page is
+    full, the id to continue from is returned in the X-Next-After-Id header.
+    Only the asked fields are fetched when fields are given.
+
+    Returns the receipts and the response headers.
+    """
+    if "after_id" in query_data:
+        after = db.db.receipts.find_one(
+            {"_id": ObjectId(query_data["after_id"]), "shop.id": shop_id},
+            {"datetime": 1},
+        )
+        if after is None:
+            abort(404, message="Receipt to continue after wasn't found.")
+        query = get_page_query(query, after)
+
+    projection = None
+    if "projection" in query_data:
+        projection = {field: 1 for field in query_data["projection"]}
+
+    receipts = list(
+        db.db.receipts.find(query, projection)
+        .sort(RECEIPTS_SORT)
+        .limit(query_data["limit"])
+    )
+    headers = {}
+    if len(receipts) == query_data["limit"]:
+        headers[NEXT_AFTER_ID_HEADER] = str(receipts[-1]["_id"])
+    return receipts, headers
+
+
+def export_receipts(query, projection):
+    """
+    Yields batches of receipts in (datetime, _id) order. The cursor fetches
+    EXPORT_BATCH_SIZE receipts at a time, so only one batch is in memory.
+    """
+    cursor = (
+        db.db.receipts.find(query, projection)
+        .sort(RECEIPTS_SORT)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    batch = []
+    for receipt in cursor:
+        batch.append(receipt)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def generate_ndjson(query):
+    # The shop is the same in every receipt, so it's left out
+    for batch in export_receipts(query, {"shop": 0, "shop_id": 0, "shift_id": 0}):
+        yield "".join(
+            json.dumps(receipt, default=export_value, ensure_ascii=False) + "\n"
+            for receipt in batch
+        )
+
+
+def generate_csv(query):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    # The header goes out before the first query is done
+    yield buffer.getvalue()
+    projection = ["fn", "datetime", "sell_type", "sum", "seller.id", "items.id"]
+    for batch in export_receipts(query, projection):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            {
+                "id": str(receipt["_id"]),
+                "fn": receipt.get("fn"),
+                "datetime": receipt["datetime"].isoformat(),
+                "sell_type": receipt["sell_type"],
+                "sum": str(receipt["sum"]),
+                "seller_id": receipt["seller"]["id"],
+                "items_count": len(receipt["items"]),
+            }
+            for receipt in batch
+        )
+        yield buffer.getvalue()
+
+
+def generate_gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @blp.route("/shop/<int:shop_id>/receipt")
 class ReceiptList(MethodView):
     @blp.arguments(ReceiptSchema)
@@ -48,84 +253,61 @@ class ReceiptList(MethodView):
     )
     @blp.alt_response(404, description="Opened shifts not found.")
     def post(self, receipt_data, user_check_data, shop_id):
-        opened_shifts = list(
-            db.db.shifts.find({"shop_id": shop_id, "status": "opened"})
-        )
-        if not opened_shifts or len(opened_shifts) == 0:
-            abort(404, message="No shifts are opened.")
-        if len(opened_shifts) > 1:
-            abort(400, message="There shouldn't be more then 1 shifts opened at once.")
-        shift = opened_shifts[0]
-        if shift["seller"]["id"] != user_check_data["user_id"]:
-            abort(
-                401,
-                message="Should be the person who opened the shift to create receipts.",
-            )
+        shift = get_opened_shift(shop_id, user_check_data["user_id"])
         receipt_data["shop_id"] = shop_id
 
         fn = random.randint(10**12, 10**13 - 1)  # TODO: use podatkova API
 
         receipt_data["fn"] = fn
+        receipt_data["shift_id"] = shift["_id"]
+        convert_decimal(receipt_data)
 
-        result = db.db.receipts.insert_one(convert_decimal(receipt_data))
+        add_receipt_to_shift(shift, receipt_data)
+        try:
+            result = db.db.receipts.insert_one(receipt_data)
+        except Exception:
+            remove_receipt_from_shift(shift, receipt_data)
+            raise
 
         return {"message": "Receipt created.", "id": result.inserted_id, "fn": fn}
 
     @blp.arguments(ReceiptQuerySchema, location="query")
     @blp.response(200, ReceiptSchema(many=True))
+    @blp.alt_response(404, description="Receipt to continue after wasn't found.")
     def get(self, query_data, shop_id):
-        query = {"shop.id": shop_id}
-
-        query_data = convert_decimal(query_data)
-
-        if "id" in query_data:
-            query["_id"] = ObjectId(query_data["id"])
-
-        if "datetime_start" in query_data:
-            if "datetime_end" in query_data:
-                query["datetime"] = {
-                    "$gte": query_data["datetime_start"],
-                    "$lte": query_data["datetime_end"],
-                }
-            else:
-                query["datetime"] = {
-                    "$gte": query_data["datetime_start"],
-                }
-        elif "datetime_end" in query_data:
-            query["datetime"] = {
-                "$lte": query_data["datetime_end"],
-            }
-
-        if "sum_start" in query_data:
-            if "sum_end" in query_data:
-                query["sum"] = {
-                    "$gte": query_data["sum_start"],
-                    "$lte": query_data["sum_end"],
-                }
-            else:
-                query["sum"] = {
-                    "$gte": query_data["sum_start"],
-                }
-        elif "sum_end" in query_data:
-            query["sum"] = {
-                "$lte": query_data["sum_end"],
-            }
-
-        if "item_id" in query_data:
-            query["items.id"] = query_data["item_id"]
-
-        if "seller_id" in query_data:
-            query["seller.id"] = query_data["seller_id"]
-
-        if "sell_type" in query_data:
-            query["sell_type"] = query_data["sell_type"]
+        receipts, headers = paginate_receipts(
+            shop_id, get_receipts_query(shop_id, query_data), query_data
+        )
+        return receipts, 200, headers
 
-        if "item_name_part" in query_data:
-            query["items.item_name"] = {"$regex": query_data["item_name_part"]}
 
-        result_receipts = list(db.db.receipts.find(query))
+@blp.route("/shop/<int:shop_id>/receipt/export")
+class ReceiptExport(MethodView):
+    @blp.arguments(ReceiptExportQuerySchema, location="query")
+    @blp.response(200, description="Receipts streamed as NDJSON or CSV.")
+    def get(self, export_params, shop_id):
+        """
+        Streams all the matching receipts, rows are written as they are
+        fetched. With gzip the file is compressed on the fly.
+        """
+        query = get_receipts_query(shop_id, export_params)
+        if export_params["format"] == "csv":
+            chunks = generate_csv(query)
+            mimetype = "text/csv"
+        else:
+            chunks = generate_ndjson(query)
+            mimetype = "application/x-ndjson"
 
-        return result_receipts
+        filename = f"shop_{shop_id}_receipts.{export_params['format']}"
+        if export_params["gzip"]:
+            chunks = generate_gzip(chunks)
+            mimetype = "application/gzip"
+            filename += ".gz"
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
 
 
 @blp.route("/shop/<int:shop_id>/receipt/<id>")
@@ -1,11 +1,10 @@
 import random
 from datetime import datetime
-from decimal import Decimal
 
-import numpy as np
 from db import db
 from flask.views import MethodView
-from flask_smorest import Blueprint, abort
+from flask_smorest import Blueprint
+from reporting import build_report, close_shift, get_opened_shift, reopen_shift
 from resources.receipt import convert_decimal
 from schemas import ShopAndUserCheckSchema, ShopCheckSchema, XReport, ZReport
 
@@ -23,52 +22,8 @@ class XReports(MethodView):
     @blp.alt_response(404, description="Opened shifts not found.")
     def post(self, shop_user_check_data):
         shop_id = shop_user_check_data["shop_id"]
-        opened_shifts = list(
-            db.db.shifts.find({"shop_id": shop_id, "status": "opened"})
-        )
-        if not opened_shifts or len(opened_shifts) == 0:
-            abort(404, message="No shifts are opened.")
-        if len(opened_shifts) > 1:
-            abort(400, message="There shouldn't be more then 1 shifts opened at once.")
-        shift = opened_shifts[0]
-        if shift["seller"]["id"] != shop_user_check_data["user_id"]:
-            abort(
-                401,
-                message="Should be the person who opened the shift to create receipts.",
-            )
-
-        receipts_cash_query = {
-            "shop_id": shop_id,
-            "datetime": {"$gt": shift["open_time"]},
-            "sell_type": "CASH",
-        }
-        result_receipts_cash = list(db.db.receipts.find(receipts_cash_query))
-
-        receipts_card_query = {
-            "shop_id": shop_id,
-            "datetime": {"$gt": shift["open_time"]},
-            "sell_type": "CARD",
-        }
-        result_receipts_card = list(db.db.receipts.find(receipts_card_query))
-
-        report_time = datetime.now()
-
-        checks_count = len(result_receipts_card) + len(result_receipts_cash)
-        checks_cash_sum = Decimal(
-            np.sum([receipt["sum"].to_decimal() for receipt in result_receipts_cash])
-        )
-        checks_card_sum = Decimal(
-            np.sum([receipt["sum"].to_decimal() for receipt in result_receipts_card])
-        )
-
-        report = {
-            "seller": shift["seller"],
-            "datetime": report_time,
-            "checks_count": checks_count,
-            "cash_sum": checks_cash_sum,
-            "card_sum": checks_card_sum,
-            "sum": checks_card_sum + checks_cash_sum,
-        }
+        shift = get_opened_shift(shop_id, shop_user_check_data["user_id"])
+        report = build_report(shift, datetime.now())
 
         db.db.reports.insert_one(
             {**convert_decimal(report), "type": "X", "shop_id": shop_id}
@@ -97,66 +52,26 @@ class ZReports(MethodView):
     @blp.alt_response(404, description="Opened shifts not found.")
     def post(self, shop_user_check_data):
         shop_id = shop_user_check_data["shop_id"]
-        opened_shifts = list(
-            db.db.shifts.find({"shop_id": shop_id, "status": "opened"})
-        )
-        if not opened_shifts or len(opened_shifts) == 0:
-            abort(404, message="No shifts are opened.")
-        if len(opened_shifts) > 1:
-            abort(400, message="There shouldn't be more then 1 shifts opened at once.")
-        shift = opened_shifts[0]
-        if shift["seller"]["id"] != shop_user_check_data["user_id"]:
-            abort(
-                401,
-                message="Should be the person who opened the shift to create receipts.",
-            )
-
-        receipts_cash_query = {
-            "shop_id": shop_id,
-            "datetime": {"$gt": shift["open_time"]},
-            "sell_type": "CASH",
-        }
-        result_receipts_cash = list(db.db.receipts.find(receipts_cash_query))
-
-        receipts_card_query = {
-            "shop_id": shop_id,
-            "datetime": {"$gt": shift["open_time"]},
-            "sell_type": "CARD",
-        }
-        result_receipts_card = list(db.db.receipts.find(receipts_card_query))
-
+        shift = get_opened_shift(shop_id, shop_user_check_data["user_id"])
         report_time = datetime.now()
+        # Totals are taken from the shift as it was closed, so receipts
+        # counted concurrently aren't lost between reading and closing it
+        shift = close_shift(shift, report_time)
+        try:
+            report = build_report(shift, report_time)
 
-        checks_count = len(result_receipts_card) + len(result_receipts_cash)
-        checks_cash_sum = Decimal(
-            np.sum([receipt["sum"].to_decimal() for receipt in result_receipts_cash])
-        )
-        checks_card_sum = Decimal(
-            np.sum([receipt["sum"].to_decimal() for receipt in result_receipts_card])
-        )
+            fn = random.randint(10**12, 10**13 - 1)  # TODO: use podatkova API
 
-        fn = random.randint(10**12, 10**13 - 1)  # TODO: use podatkova API
-
-        report = {
-            "seller": shift["seller"],
-            "datetime": report_time,
-            "checks_count": checks_count,
-            "cash_sum": checks_cash_sum,
-            "card_sum": checks_card_sum,
-            "sum": checks_card_sum + checks_cash_sum,
-            "fn": fn,
-            "cash_given": checks_cash_sum,
-        }
-
-        shift["status"] = "closed"
-        shift["close_time"] = report_time
-        db.db.shifts.update_one(
-            {"shop_id": shop_id, "status": "opened"}, {"$set": shift}
-        )
+            report["fn"] = fn
+            report["cash_given"] = report["cash_sum"]
 
-        db.db.reports.insert_one(
-            {**convert_decimal(report), "type": "Z", "shop_id": shop_id}
-        )
+            db.db.reports.insert_one(
+                {**convert_decimal(report), "type": "Z", "shop_id": shop_id}
+            )
+        except Exception:
+            # Otherwise the shift stays closed without a Z report for good
+            reopen_shift(shift)
+            raise
 
         return report
 
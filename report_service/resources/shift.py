@@ -1,6 +1,8 @@
 from db import db
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
+from pymongo.errors import DuplicateKeyError
+from reporting import new_shift_totals
 from schemas import MessageOnlySchema, ShiftOpenSchema, ShiftSchema
 
 blp = Blueprint("Shift", "shift", description="Operations on shifts")
@@ -33,9 +35,18 @@ class Shift(MethodView):
         if opened_shifts and len(list(opened_shifts)) > 0:
             abort(409, message="There is already shift opened.")
 
-        db.db.shifts.insert_one(
-            {"shop_id": shop_id, "status": "opened", **shift_open_data}
-        )
+        try:
+            db.db.shifts.insert_one(
+                {
+                    "shop_id": shop_id,
+                    "status": "opened",
+                    **shift_open_data,
+                    "totals": new_shift_totals(),
+                }
+            )
+        except DuplicateKeyError:
+            # Another shift was opened meanwhile, see the opened_shift_unique index
+            abort(409, message="There is already shift opened.")
 
         return {"message": "Shift opened successfully."}
 
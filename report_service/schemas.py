@@ -1,5 +1,11 @@
 from marshmallow import Schema, fields
-from marshmallow.validate import Length, OneOf, Range
+from marshmallow.validate import Length, OneOf, Range, Regexp
+from webargs.fields import DelimitedList
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Top level receipt fields which can be asked for, _id is always returned
+RECEIPT_FIELDS = ["items", "seller", "shop", "sum", "datetime", "sell_type", "fn"]
 
 
 class SellerSchema(Schema):
@@ -80,8 +86,13 @@ class ReceiptSchema(Schema):
     sell_type = fields.Str(required=True, validate=OneOf(["CARD", "CASH"]))
     fn = fields.Int(dump_only=True)
 
+    def get_attribute(self, obj, attr, default):
+        # Receipts are documents, so a field left out by a projection is
+        # skipped instead of being looked up as an attribute, like dict.items
+        return obj.get(attr, default)
+
 
-class ReceiptQuerySchema(Schema):
+class ReceiptFilterSchema(Schema):
     id = fields.Str()
     datetime_start = fields.DateTime()
     datetime_end = fields.DateTime()
@@ -93,6 +104,23 @@ class ReceiptQuerySchema(Schema):
     item_name_part = fields.Str(validate=Length(min=1, max=512))
 
 
+class ReceiptQuerySchema(ReceiptFilterSchema):
+    after_id = fields.Str(validate=Regexp("^[0-9a-f]{24}$"))
+    limit = fields.Int(
+        load_default=DEFAULT_PAGE_SIZE, validate=Range(min=1, max=MAX_PAGE_SIZE)
+    )
+    projection = DelimitedList(
+        fields.Str(validate=OneOf(RECEIPT_FIELDS)),
+        data_key="fields",
+        validate=Length(min=1),
+    )
+
+
+class ReceiptExportQuerySchema(ReceiptFilterSchema):
+    format = fields.Str(load_default="ndjson", validate=OneOf(["ndjson", "csv"]))
+    gzip = fields.Bool(load_default=False)
+
+
 class UserCheckSchema(Schema):
     user_id = fields.Int(required=True)
 